@@ -1,55 +1,216 @@
+import base64
+import cProfile
 import hashlib
+import json
+import io
+import logging
+import mimetypes
 import os
+import pstats
+import random
+import re
 import secrets
+import sqlite3
 import sys
-import random
-from datetime import datetime, timedelta, timezone
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
-import boto3
-from authlib.integrations.flask_client import OAuth
-from flask import Flask, jsonify, redirect, render_template, request, url_for, flash
+import click
+from flask import (
+    Blueprint,
+    Flask,
+    Response,
+    flash,
+    current_app,
+    g,
+    has_request_context,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    send_from_directory,
+    session as flask_session,
+    url_for,
+)
 from flask_login import LoginManager, UserMixin, current_user, login_required, login_user, logout_user
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func, text
+from sqlalchemy import case, delete, event, func, insert, inspect, or_, select, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, make_transient_to_detached
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import check_password_hash, generate_password_hash
 
+from email_outbox import FileTransport, MemoryTransport, OutboxSender, SesTransport, retry_delay
+from keystrokes import keystroke_heatmap, validate_keystrokes, weakness_units
+from metrics import LATENCY_BUCKETS, STATEMENT_BUCKETS, Metrics
+from result_journal import ResultJournal
+from ttl_cache import TTLCache
+from word_store import DIFFICULTY_TIERS, UNRANKED, WordStoreRegistry, transform_words
+
 APP_ROOT = Path(__file__).resolve().parent
 WORDS_FILE = APP_ROOT / "words.txt"
 WORDS_ES_FILE = APP_ROOT / "words_es.txt"
 WORDS_FR_FILE = APP_ROOT / "words-fr.txt"
 WORDS_DE_FILE = APP_ROOT / "words-ger.txt"
 WORDS_PT_FILE = APP_ROOT / "words-port.txt"
+WORDS_CACHE_MAX_AGE = 365 * 24 * 3600
+ASSETS_DIR = APP_ROOT / "static" / "dist"
+ASSET_MAX_AGE = 365 * 24 * 3600
+# Precompressed variants written by scripts/build_assets.py, in order of preference.
+ASSET_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+PACK_REVALIDATE_SECONDS = 300
+# compile-words writes packs at Brotli quality 11 (about 0.5 s for fr); a worker that
+# has to build one itself uses a quality that takes milliseconds.
+PACK_BROTLI_QUALITY = 11
+PACK_RUNTIME_BROTLI_QUALITY = 5
+RESULTS_BATCH_MAX = 50
+HISTORY_PAGE_MAX = 200
+KEYSTROKE_TESTS_DEFAULT = 200
+KEYSTROKE_TESTS_MAX = 1000
+# Adaptive practice: share of each batch drawn from words with the user's weak
+# characters/bigrams, and how many recent keystroke logs the profile uses.
+ADAPTIVE_SHARE = float(os.environ.get("ADAPTIVE_SHARE", 0.6))
+WEAKNESS_PROFILE_TESTS = 50
+HISTORY_BUCKETS = ("day", "week", "month")
+LEADERBOARD_SIZE = int(os.environ.get("LEADERBOARD_SIZE", 50))
+LEADERBOARD_PERIODS = ("day", "week", "all")
+ALL_TIME_START = date(1970, 1, 1)
+# Fixed one-unit buckets; values above the top bucket are clamped into it.
+HISTOGRAM_MAX = {"wpm": 300, "accuracy": 100}
+RESULTS_WRITE_BEHIND = os.environ.get("RESULTS_WRITE_BEHIND", "false").lower() == "true"
+WORDS_MAX_COUNT = int(os.environ.get("WORDS_MAX_COUNT", 1000))
+WORDS_STREAM_MAX_COUNT = int(os.environ.get("WORDS_STREAM_MAX_COUNT", 100_000))
+DIFFICULTIES = tuple(name for name, *_ in DIFFICULTY_TIERS)
+# Outbox delivery: rows per batch, seconds between sweeps for retries, attempts
+# before giving up, and how long a claimed batch stays hidden from other workers.
+EMAIL_BATCH_SIZE = int(os.environ.get("EMAIL_BATCH_SIZE", 20))
+EMAIL_POLL_INTERVAL = float(os.environ.get("EMAIL_POLL_INTERVAL", 30))
+EMAIL_MAX_ATTEMPTS = int(os.environ.get("EMAIL_MAX_ATTEMPTS", 6))
+EMAIL_LEASE_SECONDS = 120
+# Reverse proxies in front of the app (1 on Render). Their X-Forwarded-For/-Proto
+# headers are trusted, so remote_addr is the client and rate limits are per client.
+PROXY_FIX_HOPS = int(os.environ.get("PROXY_FIX_HOPS", 0))
+WORDS_RATE_PER_SECOND = float(os.environ.get("WORDS_RATE_PER_SECOND", 2000))
+WORDS_RATE_BURST = float(os.environ.get("WORDS_RATE_BURST", 20_000))
+WORD_FILES = {
+    "en": WORDS_FILE,
+    "es": WORDS_ES_FILE,
+    "fr": WORDS_FR_FILE,
+    "de": WORDS_DE_FILE,
+    "pt": WORDS_PT_FILE,
+}
 
-app = Flask(__name__)
-app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev-secret")
-database_url = os.environ.get("DATABASE_URL")
-if database_url and database_url.startswith("postgres://"):
-    database_url = database_url.replace("postgres://", "postgresql://", 1)
-app.config["SQLALCHEMY_DATABASE_URI"] = database_url or f"sqlite:///{APP_ROOT / 'typing.db'}"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 running_alembic = any("alembic" in arg for arg in sys.argv)
 auto_create_db = os.environ.get("AUTO_CREATE_DB", "true").lower() == "true" and not running_alembic
+google_ready = bool(os.environ.get("GOOGLE_CLIENT_ID") and os.environ.get("GOOGLE_CLIENT_SECRET"))
 
-db = SQLAlchemy(app)
-login_manager = LoginManager(app)
-login_manager.login_view = "login"
-oauth = OAuth(app)
-google_oauth = oauth.register(
-    name="google",
-    client_id=os.environ.get("GOOGLE_CLIENT_ID"),
-    client_secret=os.environ.get("GOOGLE_CLIENT_SECRET"),
-    server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
-    client_kwargs={"scope": "openid email profile"},
-)
+logger = logging.getLogger(__name__)
+db = SQLAlchemy()
+login_manager = LoginManager()
+login_manager.login_view = "main.login"
+bp = Blueprint("main", __name__, cli_group=None)
+
+
+# "tuned" applies the settings below; "default" keeps SQLAlchemy's and SQLite's defaults.
+DB_ENGINE_PROFILE = os.environ.get("DB_ENGINE_PROFILE", "tuned").lower()
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 2**20)),
+}
+
+
+def engine_options(database_url):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured profile and dialect.
+
+    SQLite pragmas are applied per connection in register_sqlite_functions.
+    """
+    if DB_ENGINE_PROFILE == "default" or not database_url.startswith("postgresql"):
+        return {}
+    options = {
+        # Sync gunicorn workers serve one request at a time; the spare covers the journal thread.
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 2)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 3)),
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+    statement_timeout = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 5000))
+    if statement_timeout:
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
+def database_url_from_env():
+    database_url = os.environ.get("DATABASE_URL")
+    if database_url and database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+    return database_url or f"sqlite:///{APP_ROOT / 'typing.db'}"
+
+
+def create_app(config=None):
+    """Build the app. Nothing here touches the database, the word lists or the network.
+
+    The Google client, the SQLite schema checks and the word stores are all
+    set up on first use instead.
+    """
+    app = Flask(__name__)
+    if PROXY_FIX_HOPS:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_FIX_HOPS, x_proto=PROXY_FIX_HOPS)
+    app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev-secret")
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url_from_env()
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+    app.config.update(config or {})
+    db.init_app(app)
+    login_manager.init_app(app)
+    app.extensions["result_journal"] = ResultJournal(
+        os.environ.get("RESULTS_JOURNAL_DIR") or APP_ROOT / ".journal",
+        lambda rows: flush_journal_rows(app, rows),
+        interval=float(os.environ.get("RESULTS_FLUSH_INTERVAL", 2.0)),
+        max_batch=int(os.environ.get("RESULTS_FLUSH_BATCH", 500)),
+        fsync=os.environ.get("RESULTS_JOURNAL_FSYNC", "false").lower() == "true",
+        logger=logger,
+    )
+    app.extensions["email_sender"] = OutboxSender(
+        lambda batch_size: deliver_outbox(app, batch_size),
+        interval=EMAIL_POLL_INTERVAL,
+        batch_size=EMAIL_BATCH_SIZE,
+        logger=logger,
+    )
+    app.register_blueprint(bp)
+    db_scheme = app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0]
+    print(
+        f"[startup] db_scheme={db_scheme} google_oauth_configured={google_ready} auto_create_db={auto_create_db} "
+        f"engine_profile={DB_ENGINE_PROFILE}",
+        flush=True,
+    )
+    return app
 
-db_scheme = app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0]
-google_ready = bool(os.environ.get("GOOGLE_CLIENT_ID") and os.environ.get("GOOGLE_CLIENT_SECRET"))
-print(
-    f"[startup] db_scheme={db_scheme} google_oauth_configured={google_ready} auto_create_db={auto_create_db}",
-    flush=True,
-)
+
+def get_google_oauth():
+    """The Google OAuth client, registered on first use (importing authlib is slow)."""
+    client = current_app.extensions.get("google_oauth")
+    if client is None:
+        from authlib.integrations.flask_client import OAuth
+
+        client = OAuth(current_app).register(
+            name="google",
+            client_id=os.environ.get("GOOGLE_CLIENT_ID"),
+            client_secret=os.environ.get("GOOGLE_CLIENT_SECRET"),
+            server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+            client_kwargs={"scope": "openid email profile"},
+        )
+        current_app.extensions["google_oauth"] = client
+    return client
 
 
 class User(db.Model, UserMixin):
@@ -60,9 +221,22 @@ class User(db.Model, UserMixin):
     google_sub = db.Column(db.String(255), unique=True, nullable=True)
     timezone = db.Column(db.String(64), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Random stamp replaced on every change; cached copies with another stamp are stale.
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
 
 class TestResult(db.Model):
+    __table_args__ = (
+        db.Index(
+            "ix_test_result_user_created",
+            "user_id",
+            "created_at",
+            "id",
+            postgresql_include=["wpm", "raw_wpm", "accuracy"],
+        ),
+        db.Index("ux_test_result_user_client", "user_id", "client_id", unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     wpm = db.Column(db.Integer, nullable=False)
@@ -79,11 +253,17 @@ class TestResult(db.Model):
     accents_enabled = db.Column(db.Boolean, nullable=True, default=False)
     punctuation_enabled = db.Column(db.Boolean, nullable=True, default=False)
     hard_mode_enabled = db.Column(db.Boolean, nullable=True, default=False)
+    client_id = db.Column(db.String(64), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user = db.relationship("User", backref=db.backref("results", lazy=True))
 
 
 class PasswordResetToken(db.Model):
+    __table_args__ = (
+        db.Index("ix_password_reset_token_hash_used", "token_hash", "used_at"),
+        db.Index("ix_password_reset_token_expires_at", "expires_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     token_hash = db.Column(db.String(64), unique=True, nullable=False)
@@ -92,21 +272,302 @@ class PasswordResetToken(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user = db.relationship("User", backref=db.backref("reset_tokens", lazy=True))
 
-def load_words(path: Path) -> list[str]:
-    if not path.exists():
-        return []
-    words = [line.strip() for line in path.read_text(encoding="utf-8").splitlines()]
-    return [w for w in words if len(w) > 2]
 
+class UserStats(db.Model):
+    __tablename__ = "user_stats"
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    total_tests = db.Column(db.Integer, nullable=False, default=0)
+    wpm_sum = db.Column(db.BigInteger, nullable=False, default=0)
+    accuracy_sum = db.Column(db.BigInteger, nullable=False, default=0)
+    max_wpm = db.Column(db.Integer, nullable=False, default=0)
+    max_raw_wpm = db.Column(db.Integer, nullable=False, default=0)
+    max_accuracy = db.Column(db.Integer, nullable=False, default=0)
+    correct_chars = db.Column(db.BigInteger, nullable=False, default=0)
+    incorrect_chars = db.Column(db.BigInteger, nullable=False, default=0)
+    extra_chars = db.Column(db.BigInteger, nullable=False, default=0)
+    missed_chars = db.Column(db.BigInteger, nullable=False, default=0)
+    last_active_day = db.Column(db.Date, nullable=True)
+    streak_run = db.Column(db.Integer, nullable=False, default=0)
+    longest_streak = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class LeaderboardEntry(db.Model):
+    __tablename__ = "leaderboard_entry"
+    __table_args__ = (
+        db.UniqueConstraint("board", "period", "period_start", "user_id", name="uq_leaderboard_user"),
+        db.Index("ix_leaderboard_rank", "board", "period", "period_start", "wpm", "accuracy"),
+        db.Index("ix_leaderboard_period_start", "period", "period_start"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    board = db.Column(db.String(32), nullable=False)
+    period = db.Column(db.String(8), nullable=False)
+    period_start = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    result_id = db.Column(db.Integer, db.ForeignKey("test_result.id"), nullable=True)
+    wpm = db.Column(db.Integer, nullable=False)
+    accuracy = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    user = db.relationship("User")
+
+
+class ScoreHistogram(db.Model):
+    __tablename__ = "score_histogram"
+    board = db.Column(db.String(32), primary_key=True)
+    metric = db.Column(db.String(16), primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+
+class KeystrokeLog(db.Model):
+    """Encoded per-keystroke timings (see keystrokes.py), kept apart so result queries never load them."""
+
+    __tablename__ = "keystroke_log"
+    __table_args__ = (db.Index("ix_keystroke_log_user_result", "user_id", "result_id"),)
+
+    result_id = db.Column(db.Integer, db.ForeignKey("test_result.id"), primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+
+class EmailOutbox(db.Model):
+    """Emails waiting for the background sender; sent rows are deleted."""
+
+    __table_args__ = (
+        db.Index("ix_email_outbox_next_attempt_at", "next_attempt_at"),
+        db.Index("ix_email_outbox_lease_id", "lease_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body_text = db.Column(db.Text, nullable=False)
+    body_html = db.Column(db.Text, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Null once delivery has been given up.
+    next_attempt_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow)
+    lease_id = db.Column(db.String(32), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    # Messages still unsent after this are dropped (e.g. the reset link has expired).
+    expires_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class WeaknessProfile(db.Model):
+    """A user's weakest characters and bigrams, derived from their recent keystroke logs."""
+
+    __tablename__ = "weakness_profile"
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True, autoincrement=False)
+    # Newest keystroke_log.result_id included; a newer log means the profile is stale.
+    source_result_id = db.Column(db.Integer, nullable=False)
+    units = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+word_stores = WordStoreRegistry(
+    WORD_FILES,
+    os.environ.get("WORD_STORE_DIR") or APP_ROOT / ".wordstore",
+    logger=logger,
+)
+
+
+@bp.cli.command("compile-words")
+def compile_words_command():
+    """Compile the word lists into memory-mappable word stores and precompressed packs."""
+    for lang, stats in word_stores.compile_all().items():
+        write_language_pack(lang, word_stores.get(lang))
+        if stats["rank_source"] == UNRANKED:
+            stats["rank_source"] = "nothing (alphabetical list)"
+        print(
+            f"{lang}: {stats['words']} words ({stats['duplicates_removed']} duplicates removed), "
+            f"mean length {stats['mean_length']}, ranked by {stats['rank_source']}"
+        )
+        if not stats["tiers"]:
+            print("  no difficulty tiers; add a <list>.counts.txt frequency file to enable them")
+            continue
+        print(f"  top: {' '.join(stats['top'])}")
+        for name, tier in stats["tiers"].items():
+            print(
+                f"  {name:<6} ranks {tier['ranks']:<11} mean length {tier['mean_length']:>5}  "
+                f"effective {tier['effective_words']:>6}  top share {tier['top_share']:.2%}"
+            )
+
+
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+metrics = None
+if METRICS_TOKEN:
+    # Instrumentation is only installed when /metrics can be scraped.
+    metrics = Metrics(
+        os.environ.get("METRICS_DIR") or APP_ROOT / ".metrics",
+        interval=float(os.environ.get("METRICS_WRITE_INTERVAL", 5.0)),
+        logger=logger,
+    )
+    metrics.counter("http_requests_total", "Requests by endpoint, method and status.")
+    metrics.histogram("http_request_duration_seconds", "Request latency by endpoint.", LATENCY_BUCKETS)
+    metrics.histogram("db_statements_per_request", "SQL statements issued per request.", STATEMENT_BUCKETS)
+    metrics.counter("db_statements_total", "SQL statements by endpoint.")
+    metrics.counter("db_statement_seconds_total", "Time spent executing SQL by endpoint.")
+    metrics.counter("word_store_lookups_total", "Word store lookups by result (hit or load).")
+    metrics.gauge("db_pool_size", "Configured connection pool size, summed over workers.")
+    metrics.gauge("db_pool_checked_out", "Connections in use, summed over workers.")
+    metrics.gauge("db_pool_overflow", "Connections opened beyond the pool size, summed over workers.")
+
+    @metrics.collector
+    def collect_word_store():
+        return [
+            ("word_store_lookups_total", {"result": "hit"}, word_stores.hits),
+            ("word_store_lookups_total", {"result": "miss"}, word_stores.misses),
+        ]
+
+    @metrics.collector
+    def collect_pool():
+        pool = db.engine.pool
+        if not hasattr(pool, "checkedout"):
+            return []  # NullPool/StaticPool keep no statistics
+        return [
+            ("db_pool_size", {}, pool.size()),
+            ("db_pool_checked_out", {}, pool.checkedout()),
+            ("db_pool_overflow", {}, max(pool.overflow(), 0)),
+        ]
+
+    @bp.before_app_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_seconds = 0.0
+
+    @bp.after_app_request
+    def record_request_metrics(response):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        endpoint = request.endpoint or "unmatched"
+        metrics.inc(
+            "http_requests_total",
+            endpoint=endpoint,
+            method=request.method,
+            status=response.status_code,
+        )
+        metrics.observe("http_request_duration_seconds", time.perf_counter() - started, endpoint=endpoint)
+        metrics.observe("db_statements_per_request", g.sql_statements, endpoint=endpoint)
+        if g.sql_statements:
+            metrics.inc("db_statements_total", g.sql_statements, endpoint=endpoint)
+            metrics.inc("db_statement_seconds_total", g.sql_seconds, endpoint=endpoint)
+        metrics.maybe_write()
+        return response
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info["statement_started"] = time.perf_counter()
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def record_statement_time(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("statement_started", None)
+        if started is not None and has_request_context() and "sql_statements" in g:
+            g.sql_statements += 1
+            g.sql_seconds += time.perf_counter() - started
+
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = Path(os.environ.get("PROFILE_DIR") or APP_ROOT / ".profiles")
+# Newest reports kept; older ones are deleted as new ones are written.
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", 200))
+PROFILE_ENDPOINTS_EXCLUDED = {"static", "main.asset", "main.list_profiles", "main.download_profile"}
+
+
+def profile_token_valid(value):
+    # Bytes, because compare_digest raises TypeError on non-ASCII str.
+    return bool(PROFILE_TOKEN and value) and secrets.compare_digest(value.encode(), PROFILE_TOKEN.encode())
+
+
+def write_profile_report(profiler, statements, elapsed):
+    """Store a text report and the raw pstats dump for the current request."""
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S.%f")
+    name = f"{stamp}-{request.endpoint or 'unmatched'}-{uuid.uuid4().hex[:6]}"
+    profiler.dump_stats(PROFILE_DIR / f"{name}.prof")
+    stats_text = io.StringIO()
+    pstats.Stats(profiler, stream=stats_text).sort_stats("cumulative").print_stats(60)
+    user_id = current_user.get_id()
+    # The __profile token is a secret; keep it out of the report.
+    query = urlencode([(key, value) for key, value in request.args.items(multi=True) if key != "__profile"])
+    lines = [
+        f"{request.method} {request.path}{'?' + query if query else ''}",
+        f"user_id={user_id} elapsed_ms={elapsed * 1000:.1f} sql_statements={len(statements)} "
+        f"sql_ms={sum(duration for _, duration in statements) * 1000:.1f}",
+        "",
+        "== SQL",
+    ]
+    for statement, duration in statements:
+        lines.append(f"{duration * 1000:8.2f} ms  {' '.join(statement.split())}")
+    lines += ["", "== cProfile (cumulative)", stats_text.getvalue()]
+    (PROFILE_DIR / f"{name}.txt").write_text("\n".join(lines), encoding="utf-8")
+    prune_profile_reports()
+
+
+def prune_profile_reports():
+    """Delete all but the newest PROFILE_KEEP reports; names start with a UTC timestamp."""
+    for report in sorted(PROFILE_DIR.glob("*.txt"), reverse=True)[PROFILE_KEEP:]:
+        report.unlink(missing_ok=True)
+        report.with_suffix(".prof").unlink(missing_ok=True)
+
+
+if PROFILE_TOKEN:
+    # Hooks exist only when a token is configured; untriggered requests just skip them.
+    @bp.before_app_request
+    def start_profiling():
+        if request.endpoint in PROFILE_ENDPOINTS_EXCLUDED:
+            return
+        requested = profile_token_valid(request.args.get("__profile"))
+        if not requested and not (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE):
+            return
+        g.profile_statements = []
+        g.profile_started = time.perf_counter()
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+    @bp.teardown_app_request
+    def finish_profiling(exc):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return
+        profiler.disable()
+        elapsed = time.perf_counter() - g.pop("profile_started")
+        try:
+            write_profile_report(profiler, g.pop("profile_statements"), elapsed)
+        except OSError:
+            current_app.logger.exception("Could not write profile report")
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def start_profiled_statement(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and "profile_statements" in g:
+            conn.info["profile_statement_started"] = time.perf_counter()
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def record_profiled_statement(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("profile_statement_started", None)
+        if started is not None and has_request_context() and "profile_statements" in g:
+            g.profile_statements.append((statement, time.perf_counter() - started))
+
+
+def sqlite_local_date(value, tz_name):
+    if value is None:
+        return None
+    return local_day(datetime.fromisoformat(value), tz_name).isoformat()
+
+
+@event.listens_for(Engine, "connect")
+def register_sqlite_functions(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function("local_date", 2, sqlite_local_date, deterministic=True)
+        if DB_ENGINE_PROFILE != "default":
+            for pragma, value in SQLITE_PRAGMAS.items():
+                dbapi_connection.execute(f"PRAGMA {pragma} = {value}")
 
-WORDS_CACHE = load_words(WORDS_FILE)
-WORDS_ES_CACHE = load_words(WORDS_ES_FILE)
-WORDS_FR_CACHE = load_words(WORDS_FR_FILE)
-WORDS_DE_CACHE = load_words(WORDS_DE_FILE)
-WORDS_PT_CACHE = load_words(WORDS_PT_FILE)
 
 def ensure_sqlite_columns():
-    if not app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+    if not current_app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
         return
     columns = {
         "raw_wpm": "INTEGER DEFAULT 0",
@@ -119,6 +580,7 @@ def ensure_sqlite_columns():
         "accents_enabled": "BOOLEAN DEFAULT 0",
         "punctuation_enabled": "BOOLEAN DEFAULT 0",
         "hard_mode_enabled": "BOOLEAN DEFAULT 0",
+        "client_id": "VARCHAR(64)",
     }
     existing = {
         row[1]
@@ -129,6 +591,7 @@ def ensure_sqlite_columns():
             db.session.execute(text(f"ALTER TABLE test_result ADD COLUMN {column} {col_type}"))
     user_columns = {
         "timezone": "VARCHAR(64)",
+        "version": "INTEGER NOT NULL DEFAULT 0",
     }
     user_existing = {
         row[1]
@@ -137,60 +600,518 @@ def ensure_sqlite_columns():
     for column, col_type in user_columns.items():
         if column not in user_existing:
             db.session.execute(text(f"ALTER TABLE user ADD COLUMN {column} {col_type}"))
+    for table in (TestResult.__table__, PasswordResetToken.__table__, LeaderboardEntry.__table__):
+        for index in table.indexes:
+            index.create(db.session.connection(), checkfirst=True)
     db.session.commit()
 
 
-with app.app_context():
-    if auto_create_db and app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
-        db.create_all()
-        ensure_sqlite_columns()
+database_lock = threading.Lock()
+
+
+def migration_head():
+    """The single head revision under migrations/versions, read without importing alembic."""
+    revisions, parents = set(), set()
+    for path in (APP_ROOT / "migrations" / "versions").glob("*.py"):
+        source = path.read_text(encoding="utf-8")
+        revision = re.search(r'^revision = "(\w+)"', source, re.MULTILINE)
+        down_revision = re.search(r"^down_revision = (.+)$", source, re.MULTILINE)
+        if revision:
+            revisions.add(revision.group(1))
+        if down_revision:
+            parents.update(re.findall(r'"(\w+)"', down_revision.group(1)))
+    heads = revisions - parents
+    return heads.pop() if len(heads) == 1 else None
+
+
+def schema_marker(head):
+    """PRAGMA user_version value recording that the schema checks passed for head."""
+    return int(head[:7], 16)
+
+
+def sqlite_schema_at_head(head):
+    if db.session.execute(text("PRAGMA user_version")).scalar() == schema_marker(head):
+        return True
+    if inspect(db.engine).has_table("alembic_version"):
+        return db.session.execute(text("SELECT version_num FROM alembic_version")).scalar() == head
+    return False
+
+
+def clear_statement_timeout(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("SET statement_timeout = 0")
+    cursor.close()
+    # Commit so the pool's rollback-on-return does not undo the SET.
+    dbapi_connection.commit()
+
+
+def lift_statement_timeout():
+    """Let this process's Postgres statements run without DB_STATEMENT_TIMEOUT_MS.
+
+    The timeout is meant for web requests; the bulk CLI commands call this
+    first so a long rebuild is not cancelled partway.
+    """
+    engine = db.engine
+    if engine.dialect.name != "postgresql" or event.contains(engine, "connect", clear_statement_timeout):
+        return
+    engine.dispose()
+    event.listen(engine, "connect", clear_statement_timeout)
+
+
+def ensure_database():
+    """Create or patch a local SQLite schema once per process, skipped when already at head."""
+    app = current_app._get_current_object()
+    if app.extensions.get("database_ready"):
+        return
+    with database_lock:
+        if app.extensions.get("database_ready"):
+            return
+        if auto_create_db and current_app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+            head = migration_head()
+            if head is None or not sqlite_schema_at_head(head):
+                db.create_all()
+                ensure_sqlite_columns()
+                if head is not None:
+                    db.session.execute(text(f"PRAGMA user_version = {schema_marker(head)}"))
+            db.session.commit()
+        app.extensions["database_ready"] = True
+
+
+@bp.before_app_request
+def prepare_database():
+    ensure_database()
+
+
+@bp.before_app_request
+def start_background_threads():
+    # Each worker starts its threads on its first request, so results journaled by a
+    # crashed worker and emails awaiting retry are handled without waiting for new
+    # traffic of the same kind.
+    current_app.extensions["result_journal"].start()
+    current_app.extensions["email_sender"].start()
+
+
+user_cache = TTLCache(
+    maxsize=int(os.environ.get("USER_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("USER_CACHE_TTL", 60)),
+)
+USER_CACHE_COLUMNS = [column.key for column in User.__table__.columns]
+
+if metrics is not None:
+    metrics.counter("user_cache_lookups_total", "User loader cache lookups by result.")
+
+    @metrics.collector
+    def collect_user_cache():
+        return [
+            ("user_cache_lookups_total", {"result": "hit"}, user_cache.hits),
+            ("user_cache_lookups_total", {"result": "miss"}, user_cache.misses),
+        ]
+
+
+@event.listens_for(Session, "before_flush")
+def stamp_changed_users(session, flush_context, instances):
+    for obj in session.dirty:
+        if isinstance(obj, User) and session.is_modified(obj):
+            version = obj.version
+            while version == obj.version:
+                version = secrets.randbelow(2**31)
+            obj.version = version
+            session.info.setdefault("changed_users", {})[obj.id] = version
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_changed_users(session):
+    changed = session.info.pop("changed_users", {})
+    for user_id, version in changed.items():
+        user_cache.invalidate(user_id)
+        if has_request_context() and flask_session.get("_user_id") == str(user_id):
+            # Other workers compare this against their cached copy on the next request.
+            flask_session["user_version"] = version
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_changed_users(session):
+    session.info.pop("changed_users", None)
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    user_id = int(user_id)
+    expected = flask_session.get("user_version")
+    cached = user_cache.get(user_id)
+    if cached is not None and (expected is None or cached["version"] == expected):
+        user = User(**cached)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    user_cache.set(user_id, {column: getattr(user, column) for column in USER_CACHE_COLUMNS})
+    if expected != user.version:
+        flask_session["user_version"] = user.version
+    return user
+
+
+def asset_manifest():
+    """Source path -> fingerprinted name, as built by scripts/build_assets.py ({} if not built)."""
+    manifest = current_app.extensions.get("asset_manifest")
+    if manifest is None:
+        try:
+            manifest = json.loads((ASSETS_DIR / "manifest.json").read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            manifest = {}
+        current_app.extensions["asset_manifest"] = manifest
+        current_app.extensions["asset_names"] = set(manifest.values())
+    return manifest
+
+
+@bp.app_template_global()
+def asset_url(path):
+    name = asset_manifest().get(path)
+    if name is None:
+        return url_for("static", filename=path)
+    return url_for("main.asset", filename=name)
+
+
+@bp.route("/assets/<path:filename>")
+def asset(filename):
+    asset_manifest()
+    if filename not in current_app.extensions["asset_names"]:
+        return jsonify({"error": "Not found"}), 404
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    for encoding, suffix in ASSET_ENCODINGS:
+        if request.accept_encodings[encoding] and (ASSETS_DIR / f"{filename}{suffix}").is_file():
+            response = send_from_directory(
+                ASSETS_DIR,
+                f"{filename}{suffix}",
+                mimetype=mimetype,
+                download_name=filename.rsplit("/", 1)[-1],
+                max_age=ASSET_MAX_AGE,
+            )
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(ASSETS_DIR, filename, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+    response.vary.add("Accept-Encoding")
+    response.cache_control.immutable = True
+    return response
 
 
-@app.route("/")
+@bp.route("/")
 def index():
     summary = None
     if current_user.is_authenticated and current_user.username:
-        summary = get_user_summary(current_user.id)
-    return render_template("index.html", summary=summary)
+        summary = get_user_summary(current_user.id, current_user.timezone)
+    response = current_app.make_response(render_template("index.html", summary=summary))
+    if current_user.is_authenticated:
+        # Carries the user's name and stats; the service worker must not keep it for offline use.
+        response.cache_control.private = True
+        response.cache_control.no_store = True
+    return response
+
+
+class TokenBucketLimiter:
+    """Per-client token buckets kept in this worker's memory.
+
+    Each gunicorn worker has its own buckets, so the effective limit is
+    multiplied by the worker count; that is fine for shedding abuse.
+    """
+
+    def __init__(self, rate, burst, max_clients=10_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        idle_after = self.burst / self.rate if self.rate else 0
+        for key, (_, updated) in list(self._buckets.items()):
+            if now - updated >= idle_after:
+                del self._buckets[key]
+
+    def consume(self, key, cost):
+        """Take cost tokens; return 0 on success or seconds until it would succeed.
+
+        A cost above ``burst`` is charged as ``burst`` (a full bucket), so large
+        requests are still possible but leave nothing for a while afterwards.
+        """
+        if self.rate <= 0:
+            return 0
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                return (cost - tokens) / self.rate
+            if key not in self._buckets and len(self._buckets) >= self.max_clients:
+                self._prune(now)
+            self._buckets[key] = (tokens - cost, now)
+            return 0
+
+
+words_limiter = TokenBucketLimiter(WORDS_RATE_PER_SECOND, WORDS_RATE_BURST)
+
+
+def stream_words(words, count, fmt, options, rng, difficulty=None):
+    for chunk in words.iter_sample(count, rng, difficulty=difficulty):
+        chunk = transform_words(chunk, rng=rng, **options)
+        if fmt == "ndjson":
+            yield "".join(json.dumps(word, ensure_ascii=False) + "\n" for word in chunk)
+        else:
+            yield "\n".join(chunk) + "\n"
+
 
+def arg_flag(name, default=False):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "on", "yes"}
 
-@app.route("/api/words")
+
+def get_weakness_units(user_id):
+    """[[unit, weight], ...] for the user, rebuilt only when a newer keystroke log exists."""
+    latest = (
+        db.session.query(func.max(KeystrokeLog.result_id)).filter(KeystrokeLog.user_id == user_id).scalar()
+    )
+    if latest is None:
+        return []
+    profile = db.session.get(WeaknessProfile, user_id)
+    if profile is not None and profile.source_result_id == latest:
+        return json.loads(profile.units)
+    blobs = [
+        row[0]
+        for row in db.session.query(KeystrokeLog.data)
+        .filter(KeystrokeLog.user_id == user_id)
+        .order_by(KeystrokeLog.result_id.desc())
+        .limit(WEAKNESS_PROFILE_TESTS)
+    ]
+    units = weakness_units(keystroke_heatmap(blobs, top_bigrams=None))
+    if profile is None:
+        profile = WeaknessProfile(user_id=user_id)
+        db.session.add(profile)
+    profile.source_result_id = latest
+    profile.units = json.dumps(units, ensure_ascii=False)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request stored the same profile first.
+        db.session.rollback()
+    return units
+
+
+def adaptive_sample(words, units, count, rng=random, difficulty=None):
+    """Mix words containing the weak units (via the n-gram index) with uniform or tier picks."""
+    focused = words.ngram_index.sample(units, round(count * ADAPTIVE_SHARE), rng) if units else []
+    sample = [words[word_id] for word_id in focused] + words.sample(
+        count - len(focused), rng, difficulty=difficulty
+    )
+    rng.shuffle(sample)
+    return sample
+
+
+@bp.route("/api/words")
 def api_words():
     count = request.args.get("count", default=200, type=int)
     lang = request.args.get("lang", default="en", type=str)
-    if lang == "es":
-        words = WORDS_ES_CACHE
-    elif lang == "fr":
-        words = WORDS_FR_CACHE
-    elif lang == "de":
-        words = WORDS_DE_CACHE
-    elif lang == "pt":
-        words = WORDS_PT_CACHE
-    else:
-        words = WORDS_CACHE
+    seed = (request.args.get("seed") or "")[:64]
+    page = max(request.args.get("page", default=0, type=int), 0)
+    accents = arg_flag("accents", default=True)
+    options = {
+        "caps": arg_flag("caps"),
+        "punctuation": arg_flag("punctuation"),
+        "numbers": arg_flag("numbers"),
+    }
+    fmt = request.args.get("format", default="json", type=str)
+    if fmt not in {"json", "ndjson", "text"}:
+        return jsonify({"error": "Invalid format"}), 400
+    difficulty = request.args.get("difficulty") or None
+    if difficulty and difficulty not in DIFFICULTIES:
+        return jsonify({"error": f"difficulty must be one of {', '.join(DIFFICULTIES)}"}), 400
+    adaptive = arg_flag("adaptive")
+    if adaptive and fmt != "json":
+        return jsonify({"error": "adaptive requires format=json"}), 400
+    if count <= 0:
+        count = 200
+    limit = WORDS_MAX_COUNT if fmt == "json" else WORDS_STREAM_MAX_COUNT
+    if count > limit:
+        hint = "; use format=ndjson or format=text" if fmt == "json" else ""
+        return jsonify({"error": f"count must be at most {limit}{hint}"}), 400
+    retry_after = words_limiter.consume(request.remote_addr or "", max(count, 1))
+    if retry_after:
+        response = jsonify({"error": "Too many requests"})
+        response.status_code = 429
+        response.headers["Retry-After"] = str(max(1, int(retry_after + 0.999)))
+        return response
+
+    words = word_stores.get(lang, plain=not accents)
     if not words:
         return jsonify({"words": []})
+    if difficulty and difficulty not in words.tiers:
+        # Lists without frequency ranks have no tiers to draw from.
+        reason = f"has no {difficulty} tier" if words.tiers else "is not ranked"
+        return jsonify({"error": f"difficulty is not available for {lang}: its word list {reason}"}), 400
+
+    if adaptive:
+        # Depends on the signed-in user's profile, so it is never shared or cached.
+        units = get_weakness_units(current_user.id) if current_user.is_authenticated else []
+        response = jsonify(
+            {
+                "words": transform_words(
+                    adaptive_sample(words, units, count, difficulty=difficulty), **options
+                ),
+                "focus": [unit for unit, _ in units],
+            }
+        )
+        response.cache_control.private = True
+        response.cache_control.no_store = True
+        return response
+
+    if fmt != "json":
+        stream_key = f"{words.digest}:{lang}:{seed}:{page}:{difficulty or ''}"
+        rng = random.Random(stream_key) if seed else random.Random()
+        mimetype = "application/x-ndjson" if fmt == "ndjson" else "text/plain"
+        return current_app.response_class(
+            stream_words(words, count, fmt, options, rng, difficulty),
+            mimetype=f"{mimetype}; charset=utf-8",
+        )
 
-    if count <= 0:
-        count = 200
+    if not seed:
+        return jsonify({"words": transform_words(words.sample(count, difficulty=difficulty), **options)})
 
-    if len(words) >= count:
-        sample = random.sample(words, count)
+    # A seeded page is a pure function of its inputs, so it can be cached forever.
+    flags = "".join(str(int(v)) for v in (accents, *options.values()))
+    key = f"{words.digest}:{lang}:{seed}:{page}:{count}:{flags}:{difficulty or ''}"
+    etag = hashlib.sha256(key.encode()).hexdigest()[:32]
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
     else:
-        sample = random.choices(words, k=count)
+        rng = random.Random(key)
+        sample = transform_words(words.sample(count, rng, difficulty=difficulty), rng=rng, **options)
+        response = jsonify({"words": sample, "seed": seed, "page": page})
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = WORDS_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+def compress_pack(body, brotli_quality):
+    """{encoding: bytes} for a pack body, in order of preference; br only when Brotli is installed."""
+    import gzip
+
+    encoded = {"gzip": gzip.compress(body, compresslevel=9, mtime=0), "identity": body}
+    try:
+        import brotli
+    except ImportError:
+        return encoded
+    return {"br": brotli.compress(body, quality=brotli_quality), **encoded}
+
+
+def pack_path(lang, store, suffix):
+    return word_stores.cache_dir / f"{lang}-{store.digest}.pack{suffix}"
 
-    return jsonify({"words": sample})
 
+def write_language_pack(lang, store):
+    """Precompress the pack for lang next to its word store, removing older versions."""
+    for stale in word_stores.cache_dir.glob(f"{lang}-{'?' * 16}.pack.*"):
+        stale.unlink()
+    encoded = compress_pack("\n".join(store).encode("utf-8"), PACK_BROTLI_QUALITY)
+    for name, suffix in ASSET_ENCODINGS:
+        if name in encoded:
+            pack_path(lang, store, suffix).write_bytes(encoded[name])
 
-@app.route("/signup", methods=["GET", "POST"])
+
+def read_language_pack(lang, store, body):
+    """The variants compile-words wrote for this version of the pack, or None."""
+    encoded = {}
+    for name, suffix in ASSET_ENCODINGS:
+        try:
+            encoded[name] = pack_path(lang, store, suffix).read_bytes()
+        except OSError:
+            continue
+    if "gzip" not in encoded:
+        return None
+    return {**encoded, "identity": body}
+
+
+def language_pack(lang, store):
+    """Newline-separated word list for lang, with precompressed variants, built once per worker."""
+    packs = current_app.extensions.setdefault("word_packs", {})
+    pack = packs.get(lang)
+    if pack is None or pack["version"] != store.digest:
+        body = "\n".join(store).encode("utf-8")
+        encoded = read_language_pack(lang, store, body) or compress_pack(body, PACK_RUNTIME_BROTLI_QUALITY)
+        tiers = ",".join(
+            f"{name}:{first}-{first + size}:{'zipf' if zipf else 'uniform'}"
+            for name, (first, size, zipf) in store.tiers.items()
+        )
+        pack = packs[lang] = {
+            "version": store.digest, "words": len(store), "tiers": tiers, "encoded": encoded
+        }
+    return pack
+
+
+@bp.route("/api/packs/<lang>")
+def api_pack_latest(lang):
+    """Redirect to the current version of a language pack."""
+    if lang not in WORD_FILES:
+        return jsonify({"error": "Unknown language"}), 404
+    words = word_stores.get(lang)
+    if not words:
+        return jsonify({"error": "No words available"}), 404
+    response = redirect(url_for("main.api_pack", lang=lang, version=words.digest))
+    response.cache_control.public = True
+    response.cache_control.max_age = PACK_REVALIDATE_SECONDS
+    return response
+
+
+@bp.route("/api/packs/<lang>/<version>")
+def api_pack(lang, version):
+    """The whole word list for lang; the URL carries its content hash, so it never changes."""
+    if lang not in WORD_FILES:
+        return jsonify({"error": "Unknown language"}), 404
+    words = word_stores.get(lang)
+    if not words:
+        return jsonify({"error": "No words available"}), 404
+    if version != words.digest:
+        return redirect(url_for("main.api_pack_latest", lang=lang))
+    pack = language_pack(lang, words)
+    if request.if_none_match.contains(version):
+        response = current_app.response_class(status=304)
+    else:
+        encoding = next(
+            (name for name in pack["encoded"] if name == "identity" or request.accept_encodings[name]),
+        )
+        response = current_app.response_class(pack["encoded"][encoding], mimetype="text/plain")
+        if encoding != "identity":
+            response.content_encoding = encoding
+        response.headers["X-Pack-Words"] = str(pack["words"])
+        # Ranked packs list words most frequent first; tiers are rank ranges of that order.
+        if pack["tiers"]:
+            response.headers["X-Pack-Tiers"] = pack["tiers"]
+    response.set_etag(version)
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.max_age = WORDS_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+@bp.route("/sw.js")
+def service_worker():
+    # Served from the root so the worker's scope covers the whole site.
+    response = send_from_directory(APP_ROOT / "static", "sw.js", mimetype="text/javascript", max_age=0)
+    response.cache_control.no_cache = True
+    return response
+
+
+@bp.route("/signup", methods=["GET", "POST"])
 def signup():
     if current_user.is_authenticated:
-        return redirect(url_for("profile"))
+        return redirect(url_for("main.profile"))
     if request.method == "POST":
         email = request.form.get("email", "").strip().lower()
         username = request.form.get("username", "").strip()
@@ -216,14 +1137,14 @@ def signup():
         db.session.add(user)
         db.session.commit()
         login_user(user)
-        return redirect(url_for("index"))
+        return redirect(url_for("main.index"))
     return render_template("signup.html")
 
 
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for("profile"))
+        return redirect(url_for("main.profile"))
     if request.method == "POST":
         email = request.form.get("email", "").strip().lower()
         password = request.form.get("password", "")
@@ -232,37 +1153,38 @@ def login():
             flash("Invalid email or password.")
             return render_template("login.html")
         login_user(user)
-        return redirect(url_for("index"))
+        return redirect(url_for("main.index"))
     return render_template("login.html")
 
 
-@app.route("/logout")
+@bp.route("/logout")
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for("index"))
+    return redirect(url_for("main.index"))
 
 
-@app.route("/auth/google")
+@bp.route("/auth/google")
 def auth_google():
     if not os.environ.get("GOOGLE_CLIENT_ID") or not os.environ.get("GOOGLE_CLIENT_SECRET"):
         flash("Google login is not configured.")
-        return redirect(url_for("login"))
-    redirect_uri = url_for("auth_google_callback", _external=True)
-    return google_oauth.authorize_redirect(redirect_uri)
+        return redirect(url_for("main.login"))
+    redirect_uri = url_for("main.auth_google_callback", _external=True)
+    return get_google_oauth().authorize_redirect(redirect_uri)
 
 
-@app.route("/auth/google/callback")
+@bp.route("/auth/google/callback")
 def auth_google_callback():
     try:
+        google_oauth = get_google_oauth()
         token = google_oauth.authorize_access_token()
         userinfo = token.get("userinfo") or google_oauth.parse_id_token(token)
     except Exception:
         flash("Google sign-in failed. Try again.")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
     if not userinfo:
         flash("Could not fetch Google profile.")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
     email = (userinfo.get("email") or "").lower()
     sub = userinfo.get("sub")
     user = User.query.filter_by(google_sub=sub).first() if sub else None
@@ -281,146 +1203,845 @@ def auth_google_callback():
     login_user(user)
     if not user.username:
         flash("Set a username to finish your profile.")
-        return redirect(url_for("profile"))
-    return redirect(url_for("index"))
-
-
-def calculate_streaks(results):
-    dates = sorted({result.created_at.date() for result in results})
-    if not dates:
-        return 0, 0
-    longest = 1
-    current = 1
-    run = 1
-    for i in range(1, len(dates)):
-        if dates[i] == dates[i - 1] + timedelta(days=1):
-            run += 1
-            longest = max(longest, run)
-        else:
-            run = 1
-    today = datetime.utcnow().date()
-    if dates[-1] == today:
-        current = 1
-        for i in range(len(dates) - 1, 0, -1):
-            if dates[i] == dates[i - 1] + timedelta(days=1):
-                current += 1
-            else:
-                break
+        return redirect(url_for("main.profile"))
+    return redirect(url_for("main.index"))
+
+
+def resolve_timezone(tz_name):
+    try:
+        return ZoneInfo(tz_name) if tz_name else timezone.utc
+    except Exception:
+        return timezone.utc
+
+
+def local_day(dt, tz_name):
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(resolve_timezone(tz_name)).date()
+
+
+# Gaps-and-islands over distinct local calendar days: consecutive days share
+# (day - row_number), so each island is one streak. Only one row per user
+# (last day, trailing run, longest run) leaves the database.
+STREAK_SQL = """
+WITH days AS (
+    SELECT DISTINCT r.user_id AS user_id, {local_day} AS day
+    FROM test_result r JOIN "user" u ON u.id = r.user_id
+    WHERE r.created_at IS NOT NULL {user_filter}
+), islands AS (
+    SELECT user_id, day, {island_key} AS grp FROM days
+), runs AS (
+    SELECT user_id, MAX(day) AS end_day, COUNT(*) AS length
+    FROM islands GROUP BY user_id, grp
+), ranked AS (
+    SELECT user_id, end_day, length,
+           ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY end_day DESC) AS rn,
+           MAX(length) OVER (PARTITION BY user_id) AS longest
+    FROM runs
+)
+SELECT user_id, end_day, length, longest FROM ranked WHERE rn = 1
+"""
+
+
+def load_streak_states(user_id=None):
+    """Return {user_id: (last_day, trailing_run, longest_run)} in each user's timezone."""
+    row_number = "ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY day)"
+    if db.session.get_bind().dialect.name == "postgresql":
+        local_day_sql = (
+            "CAST((r.created_at AT TIME ZONE 'UTC') "
+            "AT TIME ZONE COALESCE(NULLIF(u.timezone, ''), 'UTC') AS DATE)"
+        )
+        island_key = f"day - CAST({row_number} AS INTEGER)"
     else:
-        current = 0
-    return current, longest
+        local_day_sql = "local_date(r.created_at, u.timezone)"
+        island_key = f"julianday(day) - {row_number}"
+    sql = STREAK_SQL.format(
+        local_day=local_day_sql,
+        island_key=island_key,
+        user_filter="AND r.user_id = :user_id" if user_id is not None else "",
+    )
+    params = {"user_id": user_id} if user_id is not None else {}
+    return {
+        row[0]: (date.fromisoformat(str(row[1])), int(row[2]), int(row[3]))
+        for row in db.session.execute(text(sql), params)
+    }
+
+
+def current_streak(last_day, run, tz_name):
+    today = datetime.now(resolve_timezone(tz_name)).date()
+    return run if last_day == today else 0
+
+
+def calculate_streaks(user_id, tz_name=None):
+    """Return (current, longest) streaks computed in SQL without loading results."""
+    last_day, run, longest = load_streak_states(user_id).get(user_id, (None, 0, 0))
+    return current_streak(last_day, run, tz_name), longest
+
+
+def refresh_user_streak(user_id):
+    """Recompute stored streak state, e.g. after the user's timezone changes."""
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        return
+    last_day, run, longest = load_streak_states(user_id).get(user_id, (None, 0, 0))
+    stats.last_active_day = last_day
+    stats.streak_run = run
+    stats.longest_streak = longest
+
+
+def set_user_timezone(user, tz_name):
+    if user.timezone == tz_name:
+        return
+    user.timezone = tz_name
+    db.session.flush()
+    refresh_user_streak(user.id)
 
 
 def format_datetime_for_user(dt, tz_name):
     if not dt:
         return ""
-    try:
-        tz = ZoneInfo(tz_name) if tz_name else timezone.utc
-    except Exception:
-        tz = timezone.utc
     if dt.tzinfo is None:
         dt = dt.replace(tzinfo=timezone.utc)
-    return dt.astimezone(tz).strftime("%b %d, %Y %H:%M")
+    return dt.astimezone(resolve_timezone(tz_name)).strftime("%b %d, %Y %H:%M")
 
 
-def send_reset_email(to_email, reset_link):
-    from_email = os.environ.get("SES_FROM_EMAIL")
-    region = os.environ.get("AWS_REGION")
-    if not from_email or not region:
-        app.logger.warning("SES not configured; missing SES_FROM_EMAIL or AWS_REGION.")
-        return False
-    try:
-        client = boto3.client("ses", region_name=region)
-        subject = "Reset your ChecoType password"
-        body_text = (
-            "Use the link below to reset your ChecoType password. "
-            "This link expires in 1 hour.\n\n"
-            f"{reset_link}\n\n"
-            "If you did not request this, you can ignore this email."
-        )
-        body_html = f"""
+def queue_reset_email(to_email, reset_link, expires_at):
+    """Add the reset email to the outbox; it is sent once the caller's transaction commits."""
+    body_text = (
+        "Use the link below to reset your ChecoType password. "
+        "This link expires in 1 hour.\n\n"
+        f"{reset_link}\n\n"
+        "If you did not request this, you can ignore this email."
+    )
+    body_html = f"""
         <p>Use the link below to reset your ChecoType password. This link expires in 1 hour.</p>
         <p><a href="{reset_link}">Reset your password</a></p>
         <p>If you did not request this, you can ignore this email.</p>
         """
-        client.send_email(
-            Source=from_email,
-            Destination={"ToAddresses": [to_email]},
-            Message={
-                "Subject": {"Data": subject},
-                "Body": {"Text": {"Data": body_text}, "Html": {"Data": body_html}},
-            },
+    db.session.add(
+        EmailOutbox(
+            to_email=to_email,
+            subject="Reset your ChecoType password",
+            body_text=body_text,
+            body_html=body_html,
+            expires_at=expires_at,
         )
-        return True
-    except Exception:
-        app.logger.exception("Failed to send reset email")
-        return False
-
-
-def get_user_summary(user_id: int):
-    avg_wpm, avg_accuracy = db.session.query(
-        func.avg(TestResult.wpm),
-        func.avg(TestResult.accuracy),
-    ).filter(TestResult.user_id == user_id).one()
-    fastest_wpm = (
-        db.session.query(func.max(TestResult.wpm)).filter(TestResult.user_id == user_id).scalar()
-    )
-    fastest_raw_wpm = (
-        db.session.query(func.max(TestResult.raw_wpm))
-        .filter(TestResult.user_id == user_id)
-        .scalar()
-    )
-    best_accuracy = (
-        db.session.query(func.max(TestResult.accuracy))
-        .filter(TestResult.user_id == user_id)
-        .scalar()
-    )
-    total_tests = db.session.query(func.count(TestResult.id)).filter(TestResult.user_id == user_id).scalar()
-    all_results = TestResult.query.filter_by(user_id=user_id).all()
-    current_streak, longest_streak = calculate_streaks(all_results)
-    totals = db.session.query(
+    )
+
+
+def get_email_transport(app):
+    """The configured transport, created once per process and reused for every send.
+
+    EMAIL_TRANSPORT picks "ses", "file" or "memory"; by default SES is used when
+    configured, otherwise messages are written under EMAIL_OUTBOX_DIR.
+    """
+    transport = app.extensions.get("email_transport")
+    if transport is None:
+        from_email = os.environ.get("SES_FROM_EMAIL")
+        region = os.environ.get("AWS_REGION")
+        kind = os.environ.get("EMAIL_TRANSPORT") or ("ses" if from_email and region else "file")
+        if kind == "ses":
+            transport = SesTransport(from_email, region)
+        elif kind == "memory":
+            transport = MemoryTransport()
+        else:
+            directory = os.environ.get("EMAIL_OUTBOX_DIR") or APP_ROOT / ".mail"
+            app.logger.warning("SES not configured; writing emails to %s.", directory)
+            transport = FileTransport(directory)
+        app.extensions["email_transport"] = transport
+    return transport
+
+
+def deliver_outbox(app, batch_size):
+    """Claim up to batch_size due messages, send them and record the outcome.
+
+    A claim pushes next_attempt_at past EMAIL_LEASE_SECONDS under a fresh
+    lease id, so concurrent workers never send the same row and a worker that
+    dies mid-batch only delays its rows. Delivery is at least once.
+    """
+    with app.app_context():
+        ensure_database()
+        now = datetime.utcnow()
+        lease_id = uuid.uuid4().hex
+        due = (
+            select(EmailOutbox.id)
+            .where(EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(batch_size)
+        )
+        db.session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(due), EmailOutbox.next_attempt_at <= now)
+            .values(lease_id=lease_id, next_attempt_at=now + timedelta(seconds=EMAIL_LEASE_SECONDS))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        messages = EmailOutbox.query.filter_by(lease_id=lease_id).order_by(EmailOutbox.id).all()
+        if not messages:
+            return 0
+        transport = get_email_transport(app)
+        for message in messages:
+            if message.expires_at is not None and message.expires_at < datetime.utcnow():
+                give_up_email(message, "expired before delivery")
+                continue
+            try:
+                transport.send(
+                    {
+                        "to": message.to_email,
+                        "subject": message.subject,
+                        "text": message.body_text,
+                        "html": message.body_html,
+                    }
+                )
+            except Exception as exc:
+                message.attempts += 1
+                message.last_error = f"{type(exc).__name__}: {exc}"[:1000]
+                if message.attempts >= EMAIL_MAX_ATTEMPTS:
+                    give_up_email(message, message.last_error)
+                else:
+                    message.next_attempt_at = datetime.utcnow() + timedelta(
+                        seconds=retry_delay(message.attempts)
+                    )
+                    app.logger.warning("Email %s failed (attempt %s): %s", message.id, message.attempts, exc)
+            else:
+                db.session.delete(message)
+            # Commit per message so a crash later in the batch does not resend this one.
+            db.session.commit()
+        return len(messages)
+
+
+def give_up_email(message, reason):
+    # The bodies carry a live reset link, so they are not kept once delivery stops.
+    message.next_attempt_at = None
+    message.body_text = message.body_html = ""
+    message.last_error = reason
+    current_app.logger.error("Giving up on email %s: %s", message.id, reason)
+
+
+@bp.cli.command("send-emails")
+def send_emails_command():
+    """Deliver every due email in the outbox now."""
+    ensure_database()
+    print(f"Handled {current_app.extensions['email_sender'].drain()} outbox emails.")
+
+
+def advance_streak(stats, day):
+    if stats.last_active_day is None or day > stats.last_active_day + timedelta(days=1):
+        stats.streak_run = 1
+    elif day == stats.last_active_day + timedelta(days=1):
+        stats.streak_run += 1
+    else:
+        # Same day, or an out-of-order result; neither extends the streak.
+        return
+    stats.last_active_day = day
+    stats.longest_streak = max(stats.longest_streak, stats.streak_run)
+
+
+def record_results_stats(user_id, results, tz_name=None):
+    """Fold flushed TestResults for one user into their stats row (same transaction)."""
+    if not results:
+        return
+    stats = db.session.get(UserStats, user_id, with_for_update=True)
+    if stats is None:
+        rebuild_user_stats(user_id)
+        return
+
+    def bump_max(column, value):
+        return case((column < value, value), else_=column)
+
+    # Counters are written as SQL expressions so concurrent workers never lose increments.
+    stats.total_tests = UserStats.total_tests + len(results)
+    stats.wpm_sum = UserStats.wpm_sum + sum(r.wpm for r in results)
+    stats.accuracy_sum = UserStats.accuracy_sum + sum(r.accuracy for r in results)
+    stats.max_wpm = bump_max(UserStats.max_wpm, max(r.wpm for r in results))
+    stats.max_raw_wpm = bump_max(UserStats.max_raw_wpm, max(r.raw_wpm for r in results))
+    stats.max_accuracy = bump_max(UserStats.max_accuracy, max(r.accuracy for r in results))
+    stats.correct_chars = UserStats.correct_chars + sum(r.correct_chars for r in results)
+    stats.incorrect_chars = UserStats.incorrect_chars + sum(r.incorrect_chars for r in results)
+    stats.extra_chars = UserStats.extra_chars + sum(r.extra_chars for r in results)
+    stats.missed_chars = UserStats.missed_chars + sum(r.missed_chars for r in results)
+    days = sorted({local_day(r.created_at, tz_name) for r in results})
+    if stats.last_active_day and days[0] < stats.last_active_day:
+        # Results recorded offline can land before the current streak; recount in SQL.
+        refresh_user_streak(user_id)
+        return
+    for day in days:
+        advance_streak(stats, day)
+
+
+def record_new_results(user_id, results, tz_name=None):
+    """Update every derived structure for freshly flushed results (same transaction)."""
+    record_results_stats(user_id, results, tz_name)
+    update_leaderboards(results)
+    update_histograms(results)
+
+
+def rebuild_user_stats(user_id=None):
+    """Recompute user_stats from test_result for one user, or every user when user_id is None."""
+    query = db.session.query(
+        TestResult.user_id,
+        func.count(TestResult.id),
+        func.sum(TestResult.wpm),
+        func.sum(TestResult.accuracy),
+        func.max(TestResult.wpm),
+        func.max(TestResult.raw_wpm),
+        func.max(TestResult.accuracy),
         func.sum(TestResult.correct_chars),
         func.sum(TestResult.incorrect_chars),
         func.sum(TestResult.extra_chars),
         func.sum(TestResult.missed_chars),
-    ).filter(TestResult.user_id == user_id).one()
+    ).group_by(TestResult.user_id)
+    delete_stats = delete(UserStats)
+    if user_id is not None:
+        query = query.filter(TestResult.user_id == user_id)
+        delete_stats = delete_stats.where(UserStats.user_id == user_id)
+    streaks = load_streak_states(user_id)
+    rows = []
+    for row in query:
+        last_day, run, longest = streaks.get(row[0], (None, 0, 0))
+        rows.append(
+            {
+                "user_id": row[0],
+                "total_tests": int(row[1] or 0),
+                "wpm_sum": int(row[2] or 0),
+                "accuracy_sum": int(row[3] or 0),
+                "max_wpm": int(row[4] or 0),
+                "max_raw_wpm": int(row[5] or 0),
+                "max_accuracy": int(row[6] or 0),
+                "correct_chars": int(row[7] or 0),
+                "incorrect_chars": int(row[8] or 0),
+                "extra_chars": int(row[9] or 0),
+                "missed_chars": int(row[10] or 0),
+                "last_active_day": last_day,
+                "streak_run": run,
+                "longest_streak": longest,
+            }
+        )
+    if user_id is not None and not rows:
+        rows.append({"user_id": user_id, "streak_run": 0, "longest_streak": 0})
+    db.session.execute(delete_stats)
+    if rows:
+        db.session.execute(insert(UserStats), rows)
+    return len(rows)
+
+
+@bp.cli.command("rebuild-user-stats")
+def rebuild_user_stats_command():
+    """Recompute the user_stats table from test_result history."""
+    lift_statement_timeout()
+    ensure_database()
+    count = rebuild_user_stats()
+    db.session.commit()
+    print(f"Rebuilt stats for {count} users.")
+
+
+def leaderboard_key(language, duration, caps, accents, punctuation, hard_mode):
+    flags = "".join("1" if flag else "0" for flag in (caps, accents, punctuation, hard_mode))
+    return f"{language or 'en'}:{int(duration)}:{flags}"
+
+
+def result_leaderboard_key(result):
+    return leaderboard_key(
+        result.language,
+        result.duration_seconds,
+        result.caps_enabled,
+        result.accents_enabled,
+        result.punctuation_enabled,
+        result.hard_mode_enabled,
+    )
+
+
+def period_start(period, dt):
+    """UTC start date of the day/week/all-time window containing dt."""
+    if period == "day":
+        return dt.date()
+    if period == "week":
+        return dt.date() - timedelta(days=dt.weekday())
+    return ALL_TIME_START
+
+
+def leaderboard_order():
+    return (
+        LeaderboardEntry.wpm.desc(),
+        LeaderboardEntry.accuracy.desc(),
+        LeaderboardEntry.created_at,
+    )
+
+
+def ranks_above(entry_wpm, entry_accuracy, wpm, accuracy):
+    return (wpm, accuracy) > (entry_wpm, entry_accuracy)
+
+
+def update_leaderboards(results):
+    """Admit flushed results into each board's top-N, only when they beat the current Nth.
+
+    Day and week rows from earlier windows are deleted first, and late results
+    for those windows are not admitted, so the table stays bounded.
+    """
+    current = {period: period_start(period, datetime.utcnow()) for period in LEADERBOARD_PERIODS}
+    db.session.execute(
+        delete(LeaderboardEntry).where(
+            or_(
+                *(
+                    (LeaderboardEntry.period == period) & (LeaderboardEntry.period_start < start)
+                    for period, start in current.items()
+                    if period != "all"
+                )
+            )
+        )
+    )
+    for result in results:
+        board = result_leaderboard_key(result)
+        for period in LEADERBOARD_PERIODS:
+            start = period_start(period, result.created_at)
+            if start < current[period]:
+                continue
+            scope = LeaderboardEntry.query.filter_by(board=board, period=period, period_start=start)
+            mine = scope.filter_by(user_id=result.user_id).first()
+            if mine is not None:
+                if ranks_above(mine.wpm, mine.accuracy, result.wpm, result.accuracy):
+                    mine.wpm = result.wpm
+                    mine.accuracy = result.accuracy
+                    mine.result_id = result.id
+                    mine.created_at = result.created_at
+                continue
+            nth = scope.order_by(*leaderboard_order()).offset(LEADERBOARD_SIZE - 1).first()
+            if nth is not None and not ranks_above(nth.wpm, nth.accuracy, result.wpm, result.accuracy):
+                continue
+            db.session.add(
+                LeaderboardEntry(
+                    board=board,
+                    period=period,
+                    period_start=start,
+                    user_id=result.user_id,
+                    result_id=result.id,
+                    wpm=result.wpm,
+                    accuracy=result.accuracy,
+                    created_at=result.created_at,
+                )
+            )
+            if nth is not None:
+                db.session.flush()
+                overflow = [
+                    entry.id
+                    for entry in scope.order_by(*leaderboard_order()).offset(LEADERBOARD_SIZE)
+                ]
+                db.session.execute(delete(LeaderboardEntry).where(LeaderboardEntry.id.in_(overflow)))
+
+
+def rebuild_leaderboards():
+    """Regenerate every board from test_result in one streaming pass.
+
+    Day and week boards are rebuilt for the current windows only; older
+    windows are dropped.
+    """
+    now = datetime.utcnow()
+    starts = {period: period_start(period, now) for period in LEADERBOARD_PERIODS}
+    columns = (
+        TestResult.id,
+        TestResult.user_id,
+        TestResult.wpm,
+        TestResult.accuracy,
+        TestResult.created_at,
+        TestResult.language,
+        TestResult.duration_seconds,
+        TestResult.caps_enabled,
+        TestResult.accents_enabled,
+        TestResult.punctuation_enabled,
+        TestResult.hard_mode_enabled,
+    )
+    best = {}
+    query = (
+        db.session.query(*columns)
+        .filter(TestResult.created_at.isnot(None))
+        .execution_options(yield_per=5000)
+    )
+    for row in query:
+        board = leaderboard_key(*row[5:])
+        for period in LEADERBOARD_PERIODS:
+            if period_start(period, row.created_at) != starts[period]:
+                continue
+            users = best.setdefault((board, period), {})
+            current = users.get(row.user_id)
+            if current is None or ranks_above(current.wpm, current.accuracy, row.wpm, row.accuracy):
+                users[row.user_id] = row
+    entries = []
+    for (board, period), users in best.items():
+        ranked = sorted(users.values(), key=lambda r: (-r.wpm, -r.accuracy, r.created_at))
+        for row in ranked[:LEADERBOARD_SIZE]:
+            entries.append(
+                {
+                    "board": board,
+                    "period": period,
+                    "period_start": starts[period],
+                    "user_id": row.user_id,
+                    "result_id": row.id,
+                    "wpm": row.wpm,
+                    "accuracy": row.accuracy,
+                    "created_at": row.created_at,
+                }
+            )
+    db.session.execute(delete(LeaderboardEntry))
+    if entries:
+        db.session.execute(insert(LeaderboardEntry), entries)
+    return len(entries)
+
+
+@bp.cli.command("rebuild-leaderboards")
+@click.option("--if-empty", is_flag=True, help="Do nothing if the table already has rows.")
+def rebuild_leaderboards_command(if_empty):
+    """Regenerate the leaderboard tables from test_result history."""
+    lift_statement_timeout()
+    ensure_database()
+    if if_empty and db.session.query(LeaderboardEntry).first() is not None:
+        print("Already populated, skipped.")
+        return
+    count = rebuild_leaderboards()
+    db.session.commit()
+    print(f"Rebuilt {count} leaderboard entries.")
+
+
+def histogram_bucket(metric, value):
+    return max(min(int(value), HISTOGRAM_MAX[metric]), 0)
+
+
+def upsert_histogram_counts(counts):
+    """Add {(board, metric, bucket): n} to score_histogram with one upsert per bucket."""
+    dialect = db.session.get_bind().dialect.name
+    upsert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    for (board, metric, bucket), count in counts.items():
+        statement = upsert(ScoreHistogram).values(board=board, metric=metric, bucket=bucket, count=count)
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["board", "metric", "bucket"],
+                set_={"count": ScoreHistogram.count + statement.excluded.count},
+            )
+        )
+
+
+def update_histograms(results):
+    """Count each result into its board's wpm and accuracy buckets: two row updates per result."""
+    counts = {}
+    for result in results:
+        board = result_leaderboard_key(result)
+        for metric in HISTOGRAM_MAX:
+            key = (board, metric, histogram_bucket(metric, getattr(result, metric)))
+            counts[key] = counts.get(key, 0) + 1
+    upsert_histogram_counts(counts)
+
+
+def rebuild_histograms():
+    """Recount every histogram from test_result with one GROUP BY per metric."""
+    db.session.execute(delete(ScoreHistogram))
+    counts = {}
+    for metric, top in HISTOGRAM_MAX.items():
+        column = getattr(TestResult, metric)
+        bucket = case((column > top, top), (column < 0, 0), else_=column)
+        mode = (
+            TestResult.language,
+            TestResult.duration_seconds,
+            TestResult.caps_enabled,
+            TestResult.accents_enabled,
+            TestResult.punctuation_enabled,
+            TestResult.hard_mode_enabled,
+        )
+        query = db.session.query(*mode, bucket, func.count(TestResult.id)).group_by(*mode, bucket)
+        for row in query:
+            # NULL and "en" languages share a board, so merge their counts.
+            key = (leaderboard_key(*row[:6]), metric, int(row[6]))
+            counts[key] = counts.get(key, 0) + row[7]
+    upsert_histogram_counts(counts)
+    return len(counts)
+
+
+@bp.cli.command("rebuild-histograms")
+@click.option("--if-empty", is_flag=True, help="Do nothing if the table already has rows.")
+def rebuild_histograms_command(if_empty):
+    """Recount the percentile histograms from test_result history."""
+    lift_statement_timeout()
+    ensure_database()
+    if if_empty and db.session.query(ScoreHistogram).first() is not None:
+        print("Already populated, skipped.")
+        return
+    count = rebuild_histograms()
+    db.session.commit()
+    print(f"Rebuilt {count} histogram buckets.")
+
+
+def result_percentiles(result):
+    """Share of results on the same board that scored strictly lower, per metric."""
+    buckets = {metric: histogram_bucket(metric, getattr(result, metric)) for metric in HISTOGRAM_MAX}
+    below = case(
+        *(
+            ((ScoreHistogram.metric == metric) & (ScoreHistogram.bucket < bucket), ScoreHistogram.count)
+            for metric, bucket in buckets.items()
+        ),
+        else_=0,
+    )
+    rows = (
+        db.session.query(ScoreHistogram.metric, func.sum(below), func.sum(ScoreHistogram.count))
+        .filter(ScoreHistogram.board == result_leaderboard_key(result))
+        .group_by(ScoreHistogram.metric)
+    )
+    percentiles = {metric: None for metric in HISTOGRAM_MAX}
+    for metric, lower, total in rows:
+        if total:
+            percentiles[metric] = round(100 * int(lower or 0) / int(total), 1)
+    return percentiles
+
+
+def get_leaderboard(board, period):
+    start = period_start(period, datetime.utcnow())
+    entries = (
+        LeaderboardEntry.query.filter_by(board=board, period=period, period_start=start)
+        .join(User)
+        .with_entities(LeaderboardEntry, User.username)
+        .order_by(*leaderboard_order())
+        .limit(LEADERBOARD_SIZE)
+        .all()
+    )
+    return [
+        {
+            "rank": rank,
+            "username": username,
+            "wpm": entry.wpm,
+            "accuracy": entry.accuracy,
+            "created_at": entry.created_at.isoformat(),
+        }
+        for rank, (entry, username) in enumerate(entries, start=1)
+    ]
+
+
+def leaderboard_args():
+    period = request.args.get("period", default="all", type=str)
+    if period not in LEADERBOARD_PERIODS:
+        period = "all"
+    board = leaderboard_key(
+        request.args.get("lang", default="en", type=str)[:8],
+        request.args.get("duration", default=60, type=int),
+        arg_flag("caps"),
+        arg_flag("accents"),
+        arg_flag("punctuation"),
+        arg_flag("hard"),
+    )
+    return board, period
+
+
+def get_user_summary(user_id: int, tz_name=None):
+    stats = db.session.get(UserStats, user_id)
+    if stats is None:
+        rebuild_user_stats(user_id)
+        db.session.commit()
+        stats = db.session.get(UserStats, user_id)
+    total_tests = stats.total_tests or 0
+    return {
+        "avg_wpm": int(stats.wpm_sum / total_tests) if total_tests else 0,
+        "avg_accuracy": int(stats.accuracy_sum / total_tests) if total_tests else 0,
+        "fastest_wpm": stats.max_wpm,
+        "fastest_raw_wpm": stats.max_raw_wpm,
+        "best_accuracy": stats.max_accuracy,
+        "total_tests": total_tests,
+        "current_streak": current_streak(stats.last_active_day, stats.streak_run, tz_name),
+        "longest_streak": stats.longest_streak,
+        "correct_chars": int(stats.correct_chars),
+        "incorrect_chars": int(stats.incorrect_chars),
+        "extra_chars": int(stats.extra_chars),
+        "missed_chars": int(stats.missed_chars),
+    }
+
+
+def encode_history_cursor(result):
+    raw = f"{result.created_at.isoformat()}|{result.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_history_cursor(cursor):
+    """Return the (created_at, id) position a cursor points after; raise ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, result_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(result_id)
+    except (UnicodeDecodeError, ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def history_page(user_id, limit, after=None):
+    """Newest-first results, continuing strictly after the (created_at, id) position when given."""
+    query = TestResult.query.filter(
+        TestResult.user_id == user_id, TestResult.created_at.isnot(None)
+    )
+    if after is not None:
+        query = query.filter(tuple_(TestResult.created_at, TestResult.id) < after)
+    return query.order_by(TestResult.created_at.desc(), TestResult.id.desc()).limit(limit).all()
+
+
+def serialize_result(result):
     return {
-        "avg_wpm": int(avg_wpm or 0),
-        "avg_accuracy": int(avg_accuracy or 0),
-        "fastest_wpm": int(fastest_wpm or 0),
-        "fastest_raw_wpm": int(fastest_raw_wpm or 0),
-        "best_accuracy": int(best_accuracy or 0),
-        "total_tests": int(total_tests or 0),
-        "current_streak": current_streak,
-        "longest_streak": longest_streak,
-        "correct_chars": int(totals[0] or 0),
-        "incorrect_chars": int(totals[1] or 0),
-        "extra_chars": int(totals[2] or 0),
-        "missed_chars": int(totals[3] or 0),
+        "id": result.id,
+        "wpm": result.wpm,
+        "raw_wpm": result.raw_wpm,
+        "accuracy": result.accuracy,
+        "duration": result.duration_seconds,
+        "chars": result.char_count,
+        "language": result.language,
+        "caps": result.caps_enabled,
+        "accents": result.accents_enabled,
+        "punctuation": result.punctuation_enabled,
+        "hard_mode": result.hard_mode_enabled,
+        "created_at": result.created_at.isoformat(),
     }
 
 
-@app.before_request
+# One row per local calendar bucket; {bucket} maps created_at to the bucket's first day.
+SERIES_SQL = """
+SELECT {bucket} AS bucket_start,
+       COUNT(*) AS tests,
+       AVG(wpm) AS avg_wpm,
+       MAX(wpm) AS max_wpm,
+       AVG(accuracy) AS avg_accuracy
+FROM test_result
+WHERE user_id = :user_id AND created_at IS NOT NULL {since_filter}
+GROUP BY 1
+ORDER BY 1
+"""
+
+
+def history_series(user_id, bucket, tz_name, since=None):
+    """Aggregate a user's results into day/week/month buckets of their local calendar."""
+    tz_name = tz_name if resolve_timezone(tz_name) is not timezone.utc else "UTC"
+    if db.session.get_bind().dialect.name == "postgresql":
+        bucket_sql = (
+            f"CAST(date_trunc('{bucket}', (created_at AT TIME ZONE 'UTC') AT TIME ZONE :tz) AS DATE)"
+        )
+    else:
+        local = "local_date(created_at, :tz)"
+        bucket_sql = {
+            "day": local,
+            "week": f"date({local}, 'weekday 0', '-6 days')",
+            "month": f"date({local}, 'start of month')",
+        }[bucket]
+    params = {"user_id": user_id, "tz": tz_name}
+    since_filter = ""
+    if since is not None:
+        start = datetime(since.year, since.month, since.day, tzinfo=resolve_timezone(tz_name))
+        params["since"] = start.astimezone(timezone.utc).replace(tzinfo=None)
+        since_filter = "AND created_at >= :since"
+    sql = SERIES_SQL.format(bucket=bucket_sql, since_filter=since_filter)
+    return [
+        {
+            "start": str(row.bucket_start),
+            "tests": int(row.tests),
+            "avg_wpm": round(float(row.avg_wpm), 1),
+            "max_wpm": int(row.max_wpm),
+            "avg_accuracy": round(float(row.avg_accuracy), 1),
+        }
+        for row in db.session.execute(text(sql), params)
+    ]
+
+
+# Breakdown dimension -> test_result column, in GROUPING() argument order.
+BREAKDOWN_COLUMNS = {
+    "language": "language",
+    "duration": "duration_seconds",
+    "caps": "caps_enabled",
+    "accents": "accents_enabled",
+    "punctuation": "punctuation_enabled",
+    "hard_mode": "hard_mode_enabled",
+}
+BREAKDOWN_AGGREGATES = """COUNT(*) AS tests, AVG(wpm) AS avg_wpm, MAX(wpm) AS max_wpm,
+       AVG(accuracy) AS avg_accuracy, MAX(accuracy) AS max_accuracy"""
+
+
+def grouping_id(column):
+    """GROUPING(all breakdown columns) for a set grouped by column alone: 0 bit for it, 1 for the rest."""
+    columns = list(BREAKDOWN_COLUMNS.values())
+    return (2 ** len(columns) - 1) ^ (1 << (len(columns) - 1 - columns.index(column)))
+
+
+def breakdown_sql():
+    columns = list(BREAKDOWN_COLUMNS.values())
+    if db.session.get_bind().dialect.name == "postgresql":
+        sets = ", ".join(f"({column})" for column in columns)
+        return (
+            f"SELECT GROUPING({', '.join(columns)}) AS grouping_id, {', '.join(columns)}, "
+            f"{BREAKDOWN_AGGREGATES} FROM test_result WHERE user_id = :user_id "
+            f"GROUP BY GROUPING SETS ({sets})"
+        )
+    # SQLite has no GROUPING SETS; one UNION ALL branch per set yields the same rows and ids.
+    branches = []
+    for column in columns:
+        selected = ", ".join(c if c == column else f"NULL AS {c}" for c in columns)
+        branches.append(
+            f"SELECT {grouping_id(column)} AS grouping_id, {selected}, {BREAKDOWN_AGGREGATES} "
+            f"FROM test_result WHERE user_id = :user_id GROUP BY {column}"
+        )
+    return " UNION ALL ".join(branches)
+
+
+def get_mode_breakdown(user_id):
+    """Counts, averages and bests per language, duration and mode flag, from one grouped query."""
+    dimensions = {grouping_id(column): (name, column) for name, column in BREAKDOWN_COLUMNS.items()}
+    breakdown = {name: [] for name in BREAKDOWN_COLUMNS}
+    for row in db.session.execute(text(breakdown_sql()), {"user_id": user_id}).mappings():
+        name, column = dimensions[row["grouping_id"]]
+        value = row[column]
+        if name == "duration":
+            value = int(value)
+        elif name != "language" and value is not None:
+            value = bool(value)
+        breakdown[name].append(
+            {
+                "value": value,
+                "tests": int(row["tests"]),
+                "avg_wpm": round(float(row["avg_wpm"]), 1),
+                "max_wpm": int(row["max_wpm"]),
+                "avg_accuracy": round(float(row["avg_accuracy"]), 1),
+                "max_accuracy": int(row["max_accuracy"]),
+            }
+        )
+    for entries in breakdown.values():
+        entries.sort(key=lambda entry: (entry["value"] is None, entry["value"]))
+    return breakdown
+
+
+SESSIONLESS_ENDPOINTS = {
+    "main.api_words",
+    "main.api_pack_latest",
+    "main.api_pack",
+    "main.service_worker",
+    "main.metrics_endpoint",
+    "main.list_profiles",
+    "main.download_profile",
+    "main.asset",
+    "static",
+}
+
+
+@bp.before_app_request
 def require_username():
+    # Public, cacheable endpoints must not touch the session, otherwise the
+    # response picks up "Vary: Cookie" and can no longer be shared.
+    if request.endpoint in SESSIONLESS_ENDPOINTS:
+        return
     if not current_user.is_authenticated:
         return
     if current_user.username:
         return
     allowed = {
-        "profile",
-        "logout",
-        "auth_google",
-        "auth_google_callback",
-        "login",
-        "signup",
+        "main.profile",
+        "main.logout",
+        "main.auth_google",
+        "main.auth_google_callback",
+        "main.login",
+        "main.signup",
         "static",
     }
     if request.endpoint in allowed or request.path.startswith("/static"):
         return
-    return redirect(url_for("profile"))
+    return redirect(url_for("main.profile"))
 
 
-@app.route("/profile", methods=["GET", "POST"])
+@bp.route("/profile", methods=["GET", "POST"])
 @login_required
 def profile():
     if request.method == "POST":
@@ -438,37 +2059,33 @@ def profile():
                 current_user.username = username
                 db.session.commit()
                 flash("Username updated.")
-            return redirect(url_for("profile"))
+            return redirect(url_for("main.profile"))
 
         if request.form.get("update_password"):
             if current_user.password_hash:
                 if not check_password_hash(current_user.password_hash, current_password):
                     flash("Current password is incorrect.")
-                    return redirect(url_for("profile"))
+                    return redirect(url_for("main.profile"))
             if not new_password or new_password != confirm_password:
                 flash("New passwords do not match.")
-                return redirect(url_for("profile"))
+                return redirect(url_for("main.profile"))
             current_user.password_hash = generate_password_hash(new_password)
             db.session.commit()
             flash("Password updated.")
-            return redirect(url_for("profile"))
+            return redirect(url_for("main.profile"))
 
-    summary = get_user_summary(current_user.id)
-    recent_results = (
-        TestResult.query.filter_by(user_id=current_user.id)
-        .order_by(TestResult.created_at.desc())
-        .limit(30)
-        .all()
-    )
+    summary = get_user_summary(current_user.id, current_user.timezone)
+    recent_results = history_page(current_user.id, 30)
     return render_template(
         "profile.html",
         results=recent_results,
         summary=summary,
+        breakdown=get_mode_breakdown(current_user.id),
         format_dt=lambda dt: format_datetime_for_user(dt, current_user.timezone),
     )
 
 
-@app.route("/forgot-password", methods=["GET", "POST"])
+@bp.route("/forgot-password", methods=["GET", "POST"])
 def forgot_password():
     if request.method == "POST":
         email = request.form.get("email", "").strip().lower()
@@ -476,33 +2093,30 @@ def forgot_password():
         if user:
             token = secrets.token_urlsafe(32)
             token_hash = hashlib.sha256(token.encode()).hexdigest()
-            reset_token = PasswordResetToken(
-                user_id=user.id,
-                token_hash=token_hash,
-                expires_at=datetime.utcnow() + timedelta(hours=1),
-            )
-            db.session.add(reset_token)
-            db.session.commit()
+            expires_at = datetime.utcnow() + timedelta(hours=1)
+            db.session.add(PasswordResetToken(user_id=user.id, token_hash=token_hash, expires_at=expires_at))
             base_url = os.environ.get("APP_BASE_URL") or request.url_root.rstrip("/")
-            reset_link = f"{base_url}{url_for('password_reset_token', token=token)}"
-            send_reset_email(user.email, reset_link)
+            reset_link = f"{base_url}{url_for('main.password_reset_token', token=token)}"
+            queue_reset_email(user.email, reset_link, expires_at)
+            db.session.commit()
+            current_app.extensions["email_sender"].wake()
         flash("If that email exists, a reset link has been sent.")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
     return render_template("forgot_password.html")
 
 
-@app.route("/reset-password")
+@bp.route("/reset-password")
 def reset_password_redirect():
-    return redirect(url_for("forgot_password"))
+    return redirect(url_for("main.forgot_password"))
 
 
-@app.route("/reset/<token>", methods=["GET", "POST"])
+@bp.route("/reset/<token>", methods=["GET", "POST"])
 def password_reset_token(token):
     token_hash = hashlib.sha256(token.encode()).hexdigest()
     reset = PasswordResetToken.query.filter_by(token_hash=token_hash, used_at=None).first()
     if not reset or reset.expires_at < datetime.utcnow():
         flash("This reset link is invalid or has expired.")
-        return redirect(url_for("forgot_password"))
+        return redirect(url_for("main.forgot_password"))
 
     if request.method == "POST":
         new_password = request.form.get("new_password", "")
@@ -514,66 +2128,355 @@ def password_reset_token(token):
         reset.used_at = datetime.utcnow()
         db.session.commit()
         flash("Password updated. You can sign in now.")
-        return redirect(url_for("login"))
+        return redirect(url_for("main.login"))
 
     return render_template("reset_token.html")
 
-@app.route("/api/results", methods=["POST"])
-@login_required
-def api_results():
-    if not current_user.username:
-        return jsonify({"error": "Set username first"}), 403
-    payload = request.get_json(silent=True) or {}
+def parse_result_payload(payload):
+    """Validate one result payload into TestResult column values; raise ValueError if invalid."""
     try:
-        wpm = int(payload.get("wpm", 0))
-        raw_wpm = int(payload.get("rawWpm", 0))
-        accuracy = int(payload.get("accuracy", 0))
         duration = int(payload.get("duration", 0))
-        char_count = int(payload.get("chars", 0))
-        correct_chars = int(payload.get("correctChars", 0))
-        incorrect_chars = int(payload.get("incorrectChars", 0))
-        extra_chars = int(payload.get("extraChars", 0))
-        missed_chars = int(payload.get("missedChars", 0))
-        language = (payload.get("language") or "").strip() or None
-        caps_enabled = bool(payload.get("capsEnabled"))
-        accents_enabled = bool(payload.get("accentsEnabled"))
-        punctuation_enabled = bool(payload.get("punctuationEnabled"))
-        hard_mode_enabled = bool(payload.get("hardModeEnabled"))
-        tz_name = (payload.get("timezone") or "").strip()
-    except (TypeError, ValueError):
-        return jsonify({"error": "Invalid payload"}), 400
+        values = {
+            "wpm": max(int(payload.get("wpm", 0)), 0),
+            "raw_wpm": max(int(payload.get("rawWpm", 0)), 0),
+            "accuracy": max(min(int(payload.get("accuracy", 0)), 100), 0),
+            "duration_seconds": duration,
+            "char_count": max(int(payload.get("chars", 0)), 0),
+            "correct_chars": max(int(payload.get("correctChars", 0)), 0),
+            "incorrect_chars": max(int(payload.get("incorrectChars", 0)), 0),
+            "extra_chars": max(int(payload.get("extraChars", 0)), 0),
+            "missed_chars": max(int(payload.get("missedChars", 0)), 0),
+            "language": (payload.get("language") or "").strip() or None,
+            "caps_enabled": bool(payload.get("capsEnabled")),
+            "accents_enabled": bool(payload.get("accentsEnabled")),
+            "punctuation_enabled": bool(payload.get("punctuationEnabled")),
+            "hard_mode_enabled": bool(payload.get("hardModeEnabled")),
+            "client_id": str(payload.get("clientId") or "").strip()[:64] or None,
+            "created_at": parse_completed_at(payload.get("completedAt")),
+        }
+    except (AttributeError, TypeError, ValueError, OverflowError):
+        raise ValueError("Invalid payload")
     if duration <= 0:
-        return jsonify({"error": "Invalid duration"}), 400
-    result = TestResult(
-        user_id=current_user.id,
-        wpm=max(wpm, 0),
-        raw_wpm=max(raw_wpm, 0),
-        accuracy=max(min(accuracy, 100), 0),
-        duration_seconds=duration,
-        char_count=max(char_count, 0),
-        correct_chars=max(correct_chars, 0),
-        incorrect_chars=max(incorrect_chars, 0),
-        extra_chars=max(extra_chars, 0),
-        missed_chars=max(missed_chars, 0),
-        language=language,
-        caps_enabled=caps_enabled,
-        accents_enabled=accents_enabled,
-        punctuation_enabled=punctuation_enabled,
-        hard_mode_enabled=hard_mode_enabled,
-    )
-    db.session.add(result)
+        raise ValueError("Invalid duration")
+    return values
+
+
+def parse_keystrokes(payload):
+    """The decoded keystroke log sent with a result, or None if absent or malformed.
+
+    A bad log is dropped without rejecting the result it came with.
+    """
+    encoded = payload.get("keystrokes") if isinstance(payload, dict) else None
+    if not isinstance(encoded, str) or not encoded:
+        return None
+    try:
+        data = base64.b64decode(encoded, validate=True)
+        validate_keystrokes(data)
+    except ValueError:
+        return None
+    return data
+
+
+def parse_completed_at(value):
+    """Client completion time (epoch ms) for queued results, clamped to the last 30 days."""
+    now = datetime.utcnow()
+    if value in (None, ""):
+        return now
+    completed = datetime.utcfromtimestamp(float(value) / 1000)
+    if completed > now or completed < now - timedelta(days=30):
+        return now
+    return completed
+
+
+def apply_payload_timezone(payload):
+    tz_name = (payload.get("timezone") or "").strip()
     if tz_name:
         try:
             ZoneInfo(tz_name)
         except Exception:
             tz_name = ""
         if tz_name:
-            current_user.timezone = tz_name
+            set_user_timezone(current_user, tz_name)
+
+
+def insert_results(rows):
+    """Insert result rows for any users, skipping (user_id, client_id) pairs already stored.
+
+    Stats rows are updated in the same transaction; the caller commits.
+    """
+    client_ids = {row["client_id"] for row in rows if row.get("client_id")}
+    seen = set()
+    if client_ids:
+        seen = set(
+            db.session.query(TestResult.user_id, TestResult.client_id).filter(
+                TestResult.client_id.in_(client_ids)
+            )
+        )
+    results_by_user = {}
+    keystroke_logs = []
+    for row in rows:
+        key = (row["user_id"], row.get("client_id"))
+        if key[1] and key in seen:
+            continue
+        seen.add(key)
+        values = {column: value for column, value in row.items() if column != "keystrokes"}
+        result = TestResult(**values)
+        results_by_user.setdefault(row["user_id"], []).append(result)
+        if row.get("keystrokes"):
+            keystroke_logs.append((result, base64.b64decode(row["keystrokes"])))
+    for results in results_by_user.values():
+        db.session.add_all(results)
+    db.session.flush()
+    db.session.add_all(
+        KeystrokeLog(result_id=result.id, user_id=result.user_id, data=data)
+        for result, data in keystroke_logs
+    )
+    timezones = dict(
+        db.session.query(User.id, User.timezone).filter(User.id.in_(list(results_by_user)))
+    )
+    for user_id, results in results_by_user.items():
+        record_new_results(user_id, results, timezones.get(user_id))
+    return sum(len(results) for results in results_by_user.values())
+
+
+def flush_journal_rows(app, rows):
+    for row in rows:
+        row["created_at"] = datetime.fromisoformat(row["created_at"])
+    with app.app_context():
+        ensure_database()
+        insert_results(rows)
+        db.session.commit()
+
+
+def queue_results(values_list, keystroke_logs):
+    """Write-behind path: journal validated results and acknowledge immediately."""
+    rows = []
+    for values, keystrokes in zip(values_list, keystroke_logs):
+        row = dict(values, user_id=current_user.id)
+        row["client_id"] = row["client_id"] or uuid.uuid4().hex
+        if keystrokes:
+            row["keystrokes"] = base64.b64encode(keystrokes).decode("ascii")
+        rows.append(row)
+    current_app.extensions["result_journal"].append(rows)
+
+
+@bp.cli.command("flush-results")
+def flush_results_command():
+    """Flush any journaled write-behind results into test_result."""
+    lift_statement_timeout()
+    ensure_database()
+    print(f"Flushed {current_app.extensions['result_journal'].flush_now()} journaled results.")
+
+
+@bp.route("/api/results", methods=["POST"])
+@login_required
+def api_results():
+    if not current_user.username:
+        return jsonify({"error": "Set username first"}), 403
+    payload = request.get_json(silent=True) or {}
+    try:
+        values = parse_result_payload(payload)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    keystrokes = parse_keystrokes(payload)
+    apply_payload_timezone(payload)
+    if RESULTS_WRITE_BEHIND:
+        db.session.commit()
+        queue_results([values], [keystrokes])
+        # The result reaches the histograms at flush time; rank it against them as they stand.
+        percentiles = result_percentiles(TestResult(**values))
+        return jsonify({"ok": True, "queued": True, "percentile": percentiles})
+    if values["client_id"] and TestResult.query.filter_by(
+        user_id=current_user.id, client_id=values["client_id"]
+    ).first():
+        return duplicate_result(values["client_id"])
+    result = TestResult(user_id=current_user.id, **values)
+    try:
+        db.session.add(result)
+        db.session.flush()
+        if keystrokes:
+            db.session.add(KeystrokeLog(result_id=result.id, user_id=current_user.id, data=keystrokes))
+        record_new_results(current_user.id, [result], current_user.timezone)
+        percentiles = result_percentiles(result)
+        db.session.commit()
+    except IntegrityError:
+        if not values["client_id"]:
+            raise
+        # Usually a concurrent retry of the same result was stored first.
+        db.session.rollback()
+        apply_payload_timezone(payload)
+        return duplicate_result(values["client_id"])
+    return jsonify({"ok": True, "percentile": percentiles})
+
+
+def duplicate_result(client_id):
+    """Answer a resent result with the stored row, committing any timezone change made meanwhile."""
+    existing = TestResult.query.filter_by(user_id=current_user.id, client_id=client_id).first()
+    if existing is None:
+        # The clash was on another table (e.g. a concurrent stats or leaderboard
+        # rebuild), so nothing was stored; the client will resend.
+        db.session.rollback()
+        return jsonify({"error": "Conflict, retry"}), 409
+    percentiles = result_percentiles(existing)
     db.session.commit()
-    return jsonify({"ok": True})
+    return jsonify({"ok": True, "duplicate": True, "percentile": percentiles})
 
 
-@app.route("/api/timezone", methods=["POST"])
+@bp.route("/api/results/batch", methods=["POST"])
+@login_required
+def api_results_batch():
+    if not current_user.username:
+        return jsonify({"error": "Set username first"}), 403
+    payload = request.get_json(silent=True) or {}
+    items = payload.get("results") if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Invalid payload"}), 400
+    if len(items) > RESULTS_BATCH_MAX:
+        return jsonify({"error": f"At most {RESULTS_BATCH_MAX} results per batch"}), 400
+
+    # Items are reported by clientId; rejected_indexes also covers items without one,
+    # which are refused because a retried batch could not be deduplicated.
+    parsed, rejected, rejected_indexes, keystroke_logs = [], [], [], {}
+    for index, item in enumerate(items):
+        try:
+            values = parse_result_payload(item)
+        except ValueError:
+            if isinstance(item, dict) and item.get("clientId"):
+                rejected.append(str(item["clientId"]))
+            rejected_indexes.append(index)
+            continue
+        if not values["client_id"]:
+            rejected_indexes.append(index)
+            continue
+        parsed.append(values)
+        keystroke_logs[values["client_id"]] = parse_keystrokes(item)
+    apply_payload_timezone(payload)
+    if RESULTS_WRITE_BEHIND:
+        db.session.commit()
+        queue_results(parsed, [keystroke_logs[values["client_id"]] for values in parsed])
+        return jsonify(
+            {
+                "ok": True,
+                "queued": True,
+                "accepted": list(dict.fromkeys(values["client_id"] for values in parsed)),
+                "duplicates": [],
+                "rejected": rejected,
+                "rejected_indexes": rejected_indexes,
+                "percentiles": {
+                    values["client_id"]: result_percentiles(TestResult(**values)) for values in parsed
+                },
+            }
+        )
+
+    client_ids = {values["client_id"] for values in parsed}
+    existing = {
+        row[0]
+        for row in db.session.query(TestResult.client_id).filter(
+            TestResult.user_id == current_user.id, TestResult.client_id.in_(client_ids)
+        )
+    }
+    results, accepted, seen = [], [], set(existing)
+    for values in parsed:
+        if values["client_id"] in seen:
+            continue
+        seen.add(values["client_id"])
+        results.append(TestResult(user_id=current_user.id, **values))
+        accepted.append(values["client_id"])
+    try:
+        db.session.add_all(results)
+        db.session.flush()
+        db.session.add_all(
+            KeystrokeLog(result_id=result.id, user_id=current_user.id, data=keystroke_logs[result.client_id])
+            for result in results
+            if keystroke_logs[result.client_id]
+        )
+        record_new_results(current_user.id, results, current_user.timezone)
+        percentiles = {result.client_id: result_percentiles(result) for result in results}
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent retry of the same batch won the race; the client will resend.
+        db.session.rollback()
+        return jsonify({"error": "Conflict, retry"}), 409
+    return jsonify(
+        {
+            "ok": True,
+            "accepted": accepted,
+            "duplicates": sorted(existing),
+            "rejected": rejected,
+            "rejected_indexes": rejected_indexes,
+            "percentiles": percentiles,
+        }
+    )
+
+
+@bp.route("/api/keystrokes/heatmap")
+@login_required
+def api_keystroke_heatmap():
+    """Per-key and per-bigram latency and error rates over the user's most recent tests."""
+    tests = request.args.get("tests", default=KEYSTROKE_TESTS_DEFAULT, type=int)
+    tests = max(1, min(tests, KEYSTROKE_TESTS_MAX))
+    language = (request.args.get("language") or "").strip()
+    query = db.session.query(KeystrokeLog.data).filter(KeystrokeLog.user_id == current_user.id)
+    if language:
+        query = query.join(TestResult, TestResult.id == KeystrokeLog.result_id).filter(
+            TestResult.language == language
+        )
+    blobs = [row[0] for row in query.order_by(KeystrokeLog.result_id.desc()).limit(tests)]
+    return jsonify(keystroke_heatmap(blobs))
+
+
+@bp.route("/api/stats")
+@login_required
+def api_stats():
+    return jsonify(
+        {
+            "summary": get_user_summary(current_user.id, current_user.timezone),
+            "breakdown": get_mode_breakdown(current_user.id),
+        }
+    )
+
+
+@bp.route("/api/history")
+@login_required
+def api_history():
+    limit = max(min(request.args.get("limit", default=50, type=int), HISTORY_PAGE_MAX), 1)
+    after = None
+    cursor = request.args.get("cursor", type=str)
+    if cursor:
+        try:
+            after = decode_history_cursor(cursor)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+    # One extra row tells us whether another page exists without a COUNT.
+    results = history_page(current_user.id, limit + 1, after)
+    next_cursor = encode_history_cursor(results[limit - 1]) if len(results) > limit else None
+    return jsonify(
+        {"results": [serialize_result(r) for r in results[:limit]], "next_cursor": next_cursor}
+    )
+
+
+@bp.route("/api/history/series")
+@login_required
+def api_history_series():
+    bucket = request.args.get("bucket", default="day", type=str)
+    if bucket not in HISTORY_BUCKETS:
+        return jsonify({"error": f"bucket must be one of {', '.join(HISTORY_BUCKETS)}"}), 400
+    since = None
+    if request.args.get("since"):
+        try:
+            since = date.fromisoformat(request.args["since"])
+        except ValueError:
+            return jsonify({"error": "since must be YYYY-MM-DD"}), 400
+    return jsonify(
+        {
+            "bucket": bucket,
+            "timezone": current_user.timezone or "UTC",
+            "points": history_series(current_user.id, bucket, current_user.timezone, since),
+        }
+    )
+
+
+@bp.route("/api/timezone", methods=["POST"])
 @login_required
 def api_timezone():
     payload = request.get_json(silent=True) or {}
@@ -583,12 +2486,30 @@ def api_timezone():
             ZoneInfo(tz_name)
         except Exception:
             return jsonify({"error": "Invalid timezone"}), 400
-        current_user.timezone = tz_name
+        set_user_timezone(current_user, tz_name)
         db.session.commit()
     return jsonify({"ok": True})
 
 
-@app.route("/api/debug-config")
+@bp.route("/api/leaderboard")
+def api_leaderboard():
+    board, period = leaderboard_args()
+    return jsonify({"board": board, "period": period, "entries": get_leaderboard(board, period)})
+
+
+@bp.route("/leaderboard")
+def leaderboard():
+    board, period = leaderboard_args()
+    return render_template(
+        "leaderboard.html",
+        board=board,
+        period=period,
+        entries=get_leaderboard(board, period),
+        filters=request.args,
+    )
+
+
+@bp.route("/api/debug-config")
 def api_debug_config():
     token = os.environ.get("DEBUG_CONFIG_TOKEN")
     if not token or request.args.get("token") != token:
@@ -596,7 +2517,7 @@ def api_debug_config():
     user_count = db.session.query(func.count(User.id)).scalar()
     return jsonify(
         {
-            "db_scheme": app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0],
+            "db_scheme": current_app.config["SQLALCHEMY_DATABASE_URI"].split(":", 1)[0],
             "google_ready": google_ready,
             "auto_create_db": auto_create_db,
             "user_count": int(user_count or 0),
@@ -604,6 +2525,32 @@ def api_debug_config():
     )
 
 
+@bp.route("/debug/profiles")
+def list_profiles():
+    if not profile_token_valid(request.args.get("token")):
+        return jsonify({"error": "Not found"}), 404
+    reports = sorted(PROFILE_DIR.glob("*.txt"), reverse=True) if PROFILE_DIR.exists() else []
+    return jsonify({"profiles": [path.stem for path in reports[:200]]})
+
+
+@bp.route("/debug/profiles/<path:name>")
+def download_profile(name):
+    if not profile_token_valid(request.args.get("token")):
+        return jsonify({"error": "Not found"}), 404
+    return send_from_directory(PROFILE_DIR, name, as_attachment=name.endswith(".prof"))
+
+
+@bp.route("/metrics")
+def metrics_endpoint():
+    supplied = request.args.get("token") or request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if metrics is None or not secrets.compare_digest(supplied.encode(), METRICS_TOKEN.encode()):
+        return jsonify({"error": "Not found"}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+app = create_app()
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
     app.run(host="0.0.0.0", port=port, debug=True)
@@ -0,0 +1,147 @@
+"""Transports and the background sender for the transactional email outbox.
+
+Requests never talk to the mail provider. They add an ``email_outbox`` row in
+the same transaction as the change that needs the email (e.g. a password
+reset token) and wake this process's sender thread, which claims due rows in
+batches, hands each message to one long-lived transport and reschedules
+failures with exponential backoff.
+
+A transport is any object with ``send(message)`` that raises on failure;
+``message`` is a dict with ``to``, ``subject``, ``text`` and ``html``.
+"""
+
+import atexit
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+
+
+class SesTransport:
+    """Amazon SES. The boto3 client is created on first send and reused."""
+
+    def __init__(self, from_email, region):
+        self.from_email = from_email
+        self.region = region
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3  # deferred: importing boto3 dominates cold start
+
+                    self._client = boto3.client("ses", region_name=self.region)
+        return self._client
+
+    def send(self, message):
+        self.client.send_email(
+            Source=self.from_email,
+            Destination={"ToAddresses": [message["to"]]},
+            Message={
+                "Subject": {"Data": message["subject"]},
+                "Body": {"Text": {"Data": message["text"]}, "Html": {"Data": message["html"]}},
+            },
+        )
+
+
+class FileTransport:
+    """Writes each message as a JSON file, for local development."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def send(self, message):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self.directory / f"{time.time_ns()}-{os.getpid()}.json"
+        target.write_text(json.dumps(message, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+class MemoryTransport:
+    """Keeps sent messages in ``sent``, for tests and benchmarks."""
+
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        with self._lock:
+            self.sent.append(message)
+
+
+def retry_delay(attempts, base=30.0, cap=3600.0, rng=random):
+    """Seconds before retry number ``attempts``: doubling from base, capped, with jitter."""
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return delay * rng.uniform(0.5, 1.0)
+
+
+class OutboxSender:
+    """Per-process background thread that calls ``deliver()`` until the outbox is drained.
+
+    ``deliver`` sends one batch and returns how many rows it handled; the
+    thread keeps calling it while batches come back full, then sleeps until
+    woken or ``interval`` seconds pass, so retries scheduled by other workers
+    are picked up too.
+    """
+
+    def __init__(self, deliver, interval=30.0, batch_size=20, logger=None):
+        self.deliver = deliver
+        self.interval = interval
+        self.batch_size = batch_size
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+
+    def start(self):
+        """Start this process's thread, checking the outbox right away on first start.
+
+        Called on every request, so rows left for retry by a restarted worker are
+        sent even if nobody queues a new email.
+        """
+        if self._ensure_thread():
+            self._wake.set()
+
+    def wake(self):
+        """Start this process's thread if needed and have it check the outbox now."""
+        self._ensure_thread()
+        self._wake.set()
+
+    def _ensure_thread(self):
+        # Threads do not survive fork, so each gunicorn worker starts its own.
+        if self._thread is not None and self._thread_pid == os.getpid():
+            return False
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid():
+                return False
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+            self._thread.start()
+            atexit.register(self.drain)
+            return True
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.drain()
+            except Exception:
+                if self.logger:
+                    self.logger.exception("Email outbox delivery failed")
+
+    def drain(self):
+        """Deliver batches until one comes back short; return the number of rows handled."""
+        handled = 0
+        with self._drain_lock:
+            while True:
+                count = self.deliver(self.batch_size)
+                handled += count
+                if count < self.batch_size:
+                    return handled
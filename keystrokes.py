@@ -0,0 +1,234 @@
+"""Compact per-keystroke timing logs and their latency/error analytics.
+
+The browser records, for every key press during a test, the character that
+was expected, whether the press was wrong, and the milliseconds since the
+previous press. A log is encoded as::
+
+    version (1 byte) | alphabet length (varint) | alphabet (UTF-8)
+    | count (varint) | count x (interval_ms varint, index << 1 | error varint)
+
+where ``index`` points into the alphabet of distinct expected characters and
+backspace is recorded as ``"\\b"``. Varints are unsigned LEB128, so a typical
+press costs three bytes and a 30-second test a few hundred.
+"""
+
+VERSION = 1
+BACKSPACE = "\b"
+MAX_BLOB_BYTES = 16 * 1024
+MAX_KEYSTROKES = 4000
+# Gaps longer than this are pauses, not typing latency.
+PAUSE_MS = 2000
+
+
+def write_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        if pos >= len(data) or shift > 28:
+            raise ValueError("Truncated varint")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_keystrokes(events):
+    """Encode [(expected_char, interval_ms, error), ...] in the log format."""
+    alphabet = []
+    indexes = {}
+    body = bytearray()
+    for char, interval, error in events:
+        if char not in indexes:
+            indexes[char] = len(alphabet)
+            alphabet.append(char)
+        write_varint(int(interval), body)
+        write_varint(indexes[char] << 1 | bool(error), body)
+    out = bytearray([VERSION])
+    encoded_alphabet = "".join(alphabet).encode("utf-8")
+    write_varint(len(encoded_alphabet), out)
+    out += encoded_alphabet
+    write_varint(len(events), out)
+    return bytes(out + body)
+
+
+def read_header(data):
+    """Return (alphabet, count, body_offset); raise ValueError if malformed."""
+    if not data or data[0] != VERSION:
+        raise ValueError("Unsupported keystroke log")
+    size, pos = read_varint(data, 1)
+    try:
+        alphabet = list(bytes(data[pos : pos + size]).decode("utf-8"))
+    except UnicodeDecodeError:
+        raise ValueError("Invalid alphabet")
+    count, pos = read_varint(data, pos + size)
+    if not alphabet or count > MAX_KEYSTROKES:
+        raise ValueError("Invalid keystroke count")
+    return alphabet, count, pos
+
+
+def validate_keystrokes(data):
+    """Check a whole log and return its keystroke count; raise ValueError if malformed."""
+    if len(data) > MAX_BLOB_BYTES:
+        raise ValueError("Keystroke log too large")
+    alphabet, count, pos = read_header(data)
+    for _ in range(count):
+        _, pos = read_varint(data, pos)
+        code, pos = read_varint(data, pos)
+        if code >> 1 >= len(alphabet):
+            raise ValueError("Invalid key index")
+    if pos != len(data):
+        raise ValueError("Trailing bytes")
+    return count
+
+
+def decode_varints(np, buffer):
+    """Decode a buffer of concatenated varints into a uint64 array, without a Python loop."""
+    raw = np.frombuffer(buffer, dtype=np.uint8)
+    ends = np.flatnonzero(raw < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    owner = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = (7 * (np.arange(len(raw)) - starts[owner])).astype(np.uint64)
+    return np.add.reduceat((raw & 0x7F).astype(np.uint64) << shifts, starts)
+
+
+def keystroke_heatmap(blobs, min_samples=3, top_bigrams=50):
+    """Per-key and per-bigram latency and error rates over many logs.
+
+    Headers are parsed per log; every log body is then decoded and aggregated
+    in one vectorized pass. Latency is the gap before a press, ignoring the
+    first press of each log and pauses over PAUSE_MS.
+    """
+    import numpy as np
+
+    bodies, local_alphabets, counts = [], [], []
+    for blob in blobs:
+        try:
+            alphabet, count, pos = read_header(blob)
+        except ValueError:
+            continue
+        bodies.append(bytes(blob[pos:]))
+        local_alphabets.append(alphabet)
+        counts.append(count)
+    keys = sorted({char for alphabet in local_alphabets for char in alphabet})
+    empty = {"tests": len(bodies), "keystrokes": 0, "keys": [], "bigrams": []}
+    if not bodies or not sum(counts):
+        return empty
+    values = decode_varints(np, b"".join(bodies))
+    counts = np.array(counts)
+    if len(values) != 2 * counts.sum():
+        return empty  # a stored log was corrupt; validation should make this unreachable
+
+    # Map each log's alphabet indexes onto one global key id.
+    key_id = {char: index for index, char in enumerate(keys)}
+    lookup = np.array([key_id[char] for alphabet in local_alphabets for char in alphabet])
+    lookup_offsets = np.cumsum([0] + [len(alphabet) for alphabet in local_alphabets[:-1]])
+    log_of = np.repeat(np.arange(len(counts)), counts)
+    intervals = values[0::2].astype(np.int64)
+    codes = values[1::2].astype(np.int64)
+    key = lookup[lookup_offsets[log_of] + (codes >> 1)]
+    error = (codes & 1).astype(np.int64)
+
+    first = np.zeros(len(key), dtype=bool)
+    first[np.cumsum(counts) - counts] = True
+    backspace = key_id.get(BACKSPACE, -1)
+    timed = ~first & (intervals <= PAUSE_MS)
+    pressed = key != backspace
+
+    per_key = aggregate(np, key[pressed], error[pressed], intervals[pressed], timed[pressed], len(keys))
+    key_rows = [
+        {"key": keys[index], **stats} for index, stats in per_key if stats["count"] >= min_samples
+    ]
+
+    # A bigram is a press and the press before it in the same log, neither a backspace.
+    pair = ~first & pressed
+    pair[1:] &= pressed[:-1]
+    pair_index = np.flatnonzero(pair)
+    bigram_ids, bigram = np.unique(key[pair_index - 1] * len(keys) + key[pair_index], return_inverse=True)
+    per_bigram = aggregate(
+        np, bigram, error[pair_index], intervals[pair_index], timed[pair_index], len(bigram_ids)
+    )
+    bigram_rows = [
+        {"bigram": keys[bigram_ids[index] // len(keys)] + keys[bigram_ids[index] % len(keys)], **stats}
+        for index, stats in per_bigram
+        if stats["timed"] >= min_samples
+    ]
+    bigram_rows.sort(key=lambda row: row["median_ms"], reverse=True)
+    return {
+        "tests": len(bodies),
+        "keystrokes": int(counts.sum()),
+        "keys": sorted(key_rows, key=lambda row: row["key"]),
+        "bigrams": bigram_rows[:top_bigrams],
+    }
+
+
+def aggregate(np, group, error, intervals, timed, size):
+    """Yield (group, stats) with press/error counts and mean/median latency for each group."""
+    presses = np.bincount(group, minlength=size)
+    errors = np.bincount(group, weights=error, minlength=size)
+    timed_group, timed_intervals = group[timed], intervals[timed]
+    samples = np.bincount(timed_group, minlength=size)
+    totals = np.bincount(timed_group, weights=timed_intervals, minlength=size)
+    order = np.lexsort((timed_intervals, timed_group))
+    starts = np.concatenate(([0], np.cumsum(samples)[:-1]))
+    sorted_intervals = timed_intervals[order]
+    for index in np.flatnonzero(presses):
+        n = int(samples[index])
+        middle = sorted_intervals[starts[index] + n // 2] if n else None
+        yield int(index), {
+            "count": int(presses[index]),
+            "errors": int(errors[index]),
+            "error_rate": round(float(errors[index]) / int(presses[index]), 4),
+            "timed": n,
+            "mean_ms": round(float(totals[index]) / n, 1) if n else None,
+            "median_ms": int(middle) if middle is not None else None,
+        }
+
+
+def weakness_units(heatmap, limit=12, prior=10, margin=0.25):
+    """The characters and bigrams a user is weakest at, as [[unit, weight], ...].
+
+    A unit scores its error rate relative to the user's overall rate plus its
+    median latency relative to the median key, minus 2, so an average unit
+    scores 0. Error rates are pulled toward the overall rate by ``prior``
+    pseudo-presses so rarely typed units do not dominate. Units scoring above
+    ``margin`` are returned, lowercased and weighted by their score; a bigram
+    is kept only if it scores higher than its second character alone.
+    """
+    keys = [row for row in heatmap["keys"] if row["key"].strip() and row["key"] != BACKSPACE]
+    presses = sum(row["count"] for row in keys)
+    medians = sorted(row["median_ms"] for row in keys if row["median_ms"] is not None)
+    if not presses or not medians:
+        return []
+    base_rate = max(sum(row["errors"] for row in keys) / presses, 0.01)
+    base_median = max(medians[len(medians) // 2], 1)
+
+    def score(row):
+        rate = (row["errors"] + base_rate * prior) / (row["count"] + prior)
+        return rate / base_rate + row["median_ms"] / base_median - 2
+
+    scores = {}
+    for row in keys:
+        if row["median_ms"] is not None:
+            unit = row["key"].lower()
+            scores[unit] = max(scores.get(unit, 0), score(row))
+    for row in heatmap["bigrams"]:
+        unit = row["bigram"].lower()
+        if " " in unit or row["median_ms"] is None:
+            continue
+        value = score(row)
+        if value > scores.get(unit[1], 0) and value > scores.get(unit, 0):
+            scores[unit] = value
+    ranked = sorted(
+        ((unit, value) for unit, value in scores.items() if value > margin),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    return [[unit, round(value, 3)] for unit, value in ranked[:limit]]
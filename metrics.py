@@ -0,0 +1,221 @@
+"""Minimal multi-process metrics in Prometheus text format.
+
+Each worker keeps its counters and histograms in memory and, at most every
+``interval`` seconds, writes them to its own ``worker-<pid>-<token>.json``
+snapshot. Rendering merges every snapshot in the directory. Snapshots left by
+processes that are no longer running (or by an earlier process that had the
+same pid) are folded into ``archive.json`` so totals never go backwards when
+a worker restarts; gauges are only reported for live workers.
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from result_journal import pid_alive
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class Metrics:
+    def __init__(self, directory, interval=5.0, logger=None):
+        self.directory = Path(directory)
+        self.interval = interval
+        self.logger = logger
+        self.token = uuid.uuid4().hex[:8]
+        self._definitions = {}
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+        self._pid = None
+
+    def counter(self, name, help_text):
+        self._definitions[name] = ("counter", help_text, None)
+
+    def gauge(self, name, help_text):
+        self._definitions[name] = ("gauge", help_text, None)
+
+    def histogram(self, name, help_text, buckets):
+        self._definitions[name] = ("histogram", help_text, tuple(buckets))
+
+    def collector(self, func):
+        """Register func() -> [(name, labels, value)], read at snapshot time.
+
+        Counters returned here are this process's running totals; gauges are
+        current values.
+        """
+        self._collectors.append(func)
+        return func
+
+    def inc(self, name, value=1, **labels):
+        key = (name, label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, label_key(labels))
+        buckets = self._definitions[name][2]
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    break
+            else:
+                index = len(buckets)
+            state[0][index] += 1
+            state[1] += value
+
+    @property
+    def _path(self):
+        return self.directory / f"worker-{os.getpid()}-{self.token}.json"
+
+    def _snapshot(self):
+        counters, gauges = {}, {}
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                counters[json.dumps([name, labels])] = value
+            histograms = {
+                json.dumps([name, labels]): [list(counts), total]
+                for (name, labels), (counts, total) in self._histograms.items()
+            }
+        for func in self._collectors:
+            try:
+                samples = func()
+            except Exception:
+                if self.logger:
+                    self.logger.exception("Metrics collector failed")
+                continue
+            for name, labels, value in samples:
+                target = gauges if self._definitions[name][0] == "gauge" else counters
+                target[json.dumps([name, label_key(labels)])] = value
+        return {"counters": counters, "histograms": histograms, "gauges": gauges}
+
+    def maybe_write(self):
+        """Write this worker's snapshot if the last one is older than the interval."""
+        if time.monotonic() - self._last_write >= self.interval:
+            self.write()
+
+    def write(self):
+        if self._pid != os.getpid():
+            # A forked worker starts with its parent's numbers; keep only its own.
+            if self._pid is not None:
+                with self._lock:
+                    self._counters.clear()
+                    self._histograms.clear()
+            self._pid = os.getpid()
+            self.token = uuid.uuid4().hex[:8]
+        self._last_write = time.monotonic()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, prefix=".worker", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(self._snapshot(), handle)
+        os.replace(tmp_name, self._path)
+
+    def _fold_stale(self):
+        """Merge snapshots of exited processes into the archive and delete them."""
+        pid = os.getpid()
+        stale = []
+        for path in self.directory.glob("worker-*.json"):
+            _, owner, token = path.stem.split("-")
+            if (int(owner) == pid and token != self.token) or (
+                int(owner) != pid and not pid_alive(int(owner))
+            ):
+                stale.append(path)
+        if not stale:
+            return
+        with open(self.directory / "archive.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive_path = self.directory / "archive.json"
+            archive = self._read(archive_path) or {"counters": {}, "histograms": {}}
+            for path in stale:
+                snapshot = self._read(path)
+                if snapshot is None:
+                    continue  # another worker folded it first
+                self._merge(archive, snapshot, gauges=False)
+                path.unlink()
+            tmp = archive_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(archive), encoding="utf-8")
+            os.replace(tmp, archive_path)
+
+    @staticmethod
+    def _read(path):
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _merge(into, snapshot, gauges=True):
+        for key, value in snapshot.get("counters", {}).items():
+            into["counters"][key] = into["counters"].get(key, 0) + value
+        for key, (counts, total) in snapshot.get("histograms", {}).items():
+            current = into["histograms"].setdefault(key, [[0] * len(counts), 0.0])
+            current[0] = [a + b for a, b in zip(current[0], counts)]
+            current[1] += total
+        if gauges:
+            for key, value in snapshot.get("gauges", {}).items():
+                into["gauges"][key] = into["gauges"].get(key, 0) + value
+
+    def render(self):
+        """Prometheus text exposition of every worker's metrics, summed."""
+        self.write()
+        self._fold_stale()
+        merged = {"counters": {}, "histograms": {}, "gauges": {}}
+        archive = self._read(self.directory / "archive.json")
+        if archive:
+            self._merge(merged, archive, gauges=False)
+        for path in self.directory.glob("worker-*.json"):
+            snapshot = self._read(path)
+            if snapshot:
+                self._merge(merged, snapshot)
+        samples = {}
+        for kind in ("counters", "gauges", "histograms"):
+            for key, value in merged[kind].items():
+                name, labels = json.loads(key)
+                samples.setdefault(name, []).append((labels, value))
+        lines = []
+        for name, (kind, help_text, buckets) in self._definitions.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(samples.get(name, []), key=lambda sample: sample[0]):
+                if kind != "histogram":
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+                    continue
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(buckets + (float("inf"),), counts):
+                    cumulative += count
+                    bucket_labels = format_labels(labels, [("le", format_bound(bound))])
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {total}")
+                lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
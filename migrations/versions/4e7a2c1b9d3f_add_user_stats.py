@@ -0,0 +1,40 @@
+"""add user stats
+
+Revision ID: 4e7a2c1b9d3f
+Revises: 1c6f9a2b7d8e
+Create Date: 2026-02-10 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "4e7a2c1b9d3f"
+down_revision = "1c6f9a2b7d8e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "user_stats",
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("total_tests", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("wpm_sum", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("accuracy_sum", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("max_wpm", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("max_raw_wpm", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("max_accuracy", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("correct_chars", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("incorrect_chars", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("extra_chars", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("missed_chars", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("last_active_day", sa.Date(), nullable=True),
+        sa.Column("streak_run", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("longest_streak", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+    )
+
+
+def downgrade():
+    op.drop_table("user_stats")
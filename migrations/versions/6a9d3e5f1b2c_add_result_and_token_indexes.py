@@ -0,0 +1,38 @@
+"""add result and reset token indexes
+
+Revision ID: 6a9d3e5f1b2c
+Revises: 4e7a2c1b9d3f
+Create Date: 2026-02-12 00:00:00.000000
+"""
+
+from alembic import op
+
+revision = "6a9d3e5f1b2c"
+down_revision = "4e7a2c1b9d3f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_test_result_user_created",
+        "test_result",
+        ["user_id", "created_at", "id"],
+        postgresql_include=["wpm", "raw_wpm", "accuracy"],
+    )
+    op.create_index(
+        "ix_password_reset_token_hash_used",
+        "password_reset_token",
+        ["token_hash", "used_at"],
+    )
+    op.create_index(
+        "ix_password_reset_token_expires_at",
+        "password_reset_token",
+        ["expires_at"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_password_reset_token_expires_at", table_name="password_reset_token")
+    op.drop_index("ix_password_reset_token_hash_used", table_name="password_reset_token")
+    op.drop_index("ix_test_result_user_created", table_name="test_result")
@@ -0,0 +1,29 @@
+"""add result client id
+
+Revision ID: 7b1e4f8a2d6c
+Revises: 6a9d3e5f1b2c
+Create Date: 2026-02-16 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "7b1e4f8a2d6c"
+down_revision = "6a9d3e5f1b2c"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("test_result", sa.Column("client_id", sa.String(length=64), nullable=True))
+    op.create_index(
+        "ux_test_result_user_client",
+        "test_result",
+        ["user_id", "client_id"],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("ux_test_result_user_client", table_name="test_result")
+    op.drop_column("test_result", "client_id")
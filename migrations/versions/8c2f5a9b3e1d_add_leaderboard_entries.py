@@ -0,0 +1,42 @@
+"""add leaderboard entries
+
+Revision ID: 8c2f5a9b3e1d
+Revises: 7b1e4f8a2d6c
+Create Date: 2026-02-20 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "8c2f5a9b3e1d"
+down_revision = "7b1e4f8a2d6c"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "leaderboard_entry",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("board", sa.String(length=32), nullable=False),
+        sa.Column("period", sa.String(length=8), nullable=False),
+        sa.Column("period_start", sa.Date(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("result_id", sa.Integer(), nullable=True),
+        sa.Column("wpm", sa.Integer(), nullable=False),
+        sa.Column("accuracy", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.ForeignKeyConstraint(["result_id"], ["test_result.id"]),
+        sa.UniqueConstraint("board", "period", "period_start", "user_id", name="uq_leaderboard_user"),
+    )
+    op.create_index(
+        "ix_leaderboard_rank",
+        "leaderboard_entry",
+        ["board", "period", "period_start", "wpm", "accuracy"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_leaderboard_rank", table_name="leaderboard_entry")
+    op.drop_table("leaderboard_entry")
@@ -0,0 +1,29 @@
+"""add score histograms
+
+Revision ID: 9d4b7e2c6f1a
+Revises: 8c2f5a9b3e1d
+Create Date: 2026-02-21 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "9d4b7e2c6f1a"
+down_revision = "8c2f5a9b3e1d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "score_histogram",
+        sa.Column("board", sa.String(length=32), nullable=False),
+        sa.Column("metric", sa.String(length=16), nullable=False),
+        sa.Column("bucket", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("board", "metric", "bucket"),
+    )
+
+
+def downgrade():
+    op.drop_table("score_histogram")
@@ -0,0 +1,24 @@
+"""add user version
+
+Revision ID: a1e5c7f3b9d2
+Revises: 9d4b7e2c6f1a
+Create Date: 2026-02-22 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "a1e5c7f3b9d2"
+down_revision = "9d4b7e2c6f1a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "user", sa.Column("version", sa.Integer(), nullable=False, server_default="0")
+    )
+
+
+def downgrade():
+    op.drop_column("user", "version")
@@ -0,0 +1,34 @@
+"""add keystroke logs
+
+Revision ID: b3c8e1f4a7d6
+Revises: a1e5c7f3b9d2
+Create Date: 2026-02-23 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "b3c8e1f4a7d6"
+down_revision = "a1e5c7f3b9d2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "keystroke_log",
+        sa.Column("result_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(["result_id"], ["test_result.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("result_id"),
+    )
+    op.create_index(
+        "ix_keystroke_log_user_result", "keystroke_log", ["user_id", "result_id"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index("ix_keystroke_log_user_result", table_name="keystroke_log")
+    op.drop_table("keystroke_log")
@@ -0,0 +1,30 @@
+"""add weakness profiles
+
+Revision ID: c5d9f2a6b8e4
+Revises: b3c8e1f4a7d6
+Create Date: 2026-02-24 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "c5d9f2a6b8e4"
+down_revision = "b3c8e1f4a7d6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "weakness_profile",
+        sa.Column("user_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("source_result_id", sa.Integer(), nullable=False),
+        sa.Column("units", sa.Text(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("weakness_profile")
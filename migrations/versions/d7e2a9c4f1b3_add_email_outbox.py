@@ -0,0 +1,40 @@
+"""add email outbox
+
+Revision ID: d7e2a9c4f1b3
+Revises: c5d9f2a6b8e4
+Create Date: 2026-03-03 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "d7e2a9c4f1b3"
+down_revision = "c5d9f2a6b8e4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "email_outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("to_email", sa.String(length=255), nullable=False),
+        sa.Column("subject", sa.String(length=255), nullable=False),
+        sa.Column("body_text", sa.Text(), nullable=False),
+        sa.Column("body_html", sa.Text(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=True),
+        sa.Column("lease_id", sa.String(length=32), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_email_outbox_next_attempt_at", "email_outbox", ["next_attempt_at"])
+    op.create_index("ix_email_outbox_lease_id", "email_outbox", ["lease_id"])
+
+
+def downgrade():
+    op.drop_index("ix_email_outbox_lease_id", table_name="email_outbox")
+    op.drop_index("ix_email_outbox_next_attempt_at", table_name="email_outbox")
+    op.drop_table("email_outbox")
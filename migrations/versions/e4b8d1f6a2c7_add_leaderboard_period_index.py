@@ -0,0 +1,21 @@
+"""add leaderboard period index
+
+Revision ID: e4b8d1f6a2c7
+Revises: d7e2a9c4f1b3
+Create Date: 2026-03-05 00:00:00.000000
+"""
+
+from alembic import op
+
+revision = "e4b8d1f6a2c7"
+down_revision = "d7e2a9c4f1b3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_leaderboard_period_start", "leaderboard_entry", ["period", "period_start"])
+
+
+def downgrade():
+    op.drop_index("ix_leaderboard_period_start", table_name="leaderboard_entry")
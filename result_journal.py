@@ -0,0 +1,160 @@
+"""Append-only journal for write-behind result ingestion.
+
+Each worker appends JSON lines to its own ``active-<pid>.jsonl`` segment and
+acknowledges the request immediately. A background thread rotates the segment
+to ``ready-*`` on a timer or once it holds ``max_batch`` rows, claims ready
+segments by renaming them to ``claimed-<pid>-*`` (atomic, so only one worker
+processes a segment), hands the rows to the flush callback for a bulk insert,
+and deletes the segment once the callback commits.
+
+Recovery: segments left behind by processes that are no longer running are
+returned to ``ready-*`` and replayed. The flush callback must be idempotent
+(rows carry a client id) because a crash between commit and delete replays
+the segment.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ResultJournal:
+    def __init__(self, directory, flush, interval=2.0, max_batch=500, fsync=False, logger=None):
+        self.directory = Path(directory)
+        self.flush = flush
+        self.interval = interval
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self._handle = None
+        self._pending = 0
+        self._sequence = 0
+
+    @property
+    def _active_path(self):
+        return self.directory / f"active-{os.getpid()}.jsonl"
+
+    def append(self, rows):
+        """Durably record rows; they reach the database on the next flush."""
+        lines = "".join(json.dumps(row, default=str, separators=(",", ":")) + "\n" for row in rows)
+        with self._lock:
+            if self._handle is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._handle = open(self._active_path, "a", encoding="utf-8")
+            self._handle.write(lines)
+            self._handle.flush()
+            if self.fsync:
+                os.fsync(self._handle.fileno())
+            self._pending += len(rows)
+            if self._pending >= self.max_batch:
+                self._wake.set()
+        self._ensure_thread()
+
+    def start(self):
+        """Start this process's flush thread, replaying segments left by dead workers right away.
+
+        Called on every request; after the first one in a process it only checks the thread.
+        """
+        if self._ensure_thread():
+            self._wake.set()
+
+    def _ensure_thread(self):
+        # Threads do not survive fork, so each gunicorn worker starts its own.
+        if self._thread is not None and self._thread_pid == os.getpid():
+            return False
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid():
+                return False
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="result-journal", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush_now)
+            return True
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush_now()
+            except Exception:
+                if self.logger:
+                    self.logger.exception("Result journal flush failed")
+
+    def _rotate(self):
+        with self._lock:
+            if self._handle is None:
+                return
+            self._handle.close()
+            self._handle = None
+            self._pending = 0
+            self._sequence += 1
+            target = self.directory / f"ready-{os.getpid()}-{time.time_ns()}-{self._sequence}.jsonl"
+            os.replace(self._active_path, target)
+
+    def _recover(self):
+        """Return segments owned by dead (or this, idle) process to the ready queue."""
+        pid = os.getpid()
+        for path in self.directory.glob("active-*.jsonl"):
+            owner = int(path.stem.split("-")[1])
+            if owner != pid and not pid_alive(owner):
+                os.replace(path, self.directory / f"ready-{owner}-{time.time_ns()}-0.jsonl")
+        for path in self.directory.glob("claimed-*.jsonl"):
+            owner = int(path.stem.split("-")[1])
+            if owner == pid or not pid_alive(owner):
+                rest = path.name.split("-", 2)[2]
+                os.replace(path, self.directory / f"ready-{rest}")
+
+    def flush_now(self):
+        """Rotate this worker's segment and flush every ready segment."""
+        if not self.directory.exists():
+            return 0
+        with self._flush_lock:
+            self._rotate()
+            self._recover()
+            flushed = 0
+            for path in sorted(self.directory.glob("ready-*.jsonl")):
+                claimed = self.directory / f"claimed-{os.getpid()}-{path.name.split('-', 1)[1]}"
+                try:
+                    os.replace(path, claimed)
+                except FileNotFoundError:
+                    continue  # another worker claimed it first
+                try:
+                    flushed += self._flush_segment(claimed)
+                except Exception:
+                    os.replace(claimed, path)
+                    raise
+                claimed.unlink()
+            return flushed
+
+    def _flush_segment(self, path):
+        rows = []
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write; the request was never acknowledged.
+                    if self.logger:
+                        self.logger.warning("Skipping corrupt journal line in %s", path.name)
+        for start in range(0, len(rows), self.max_batch):
+            self.flush(rows[start : start + self.max_batch])
+        return len(rows)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""Compare engine profiles under concurrent multi-process writes and reads.
+
+For each profile in --profiles, starts --writers processes that POST
+/api/results and --readers processes that GET /profile simultaneously, like
+gunicorn workers sharing one database. Reports throughput, p95 latency and
+failed requests (e.g. "database is locked") per profile.
+
+    python scripts/bench_engine.py --profiles default,tuned --writers 4 --readers 2
+    DATABASE_URL=postgresql://... python scripts/bench_engine.py --profiles tuned
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+PASSWORD = "engine-pass"
+
+SETUP = """
+import sys
+from werkzeug.security import generate_password_hash
+from app import User, app, db, ensure_database
+with app.app_context():
+    ensure_database()
+    password_hash = generate_password_hash(sys.argv[2])
+    for index in range(int(sys.argv[1])):
+        email = f"engine{index}@example.com"
+        if not User.query.filter_by(email=email).first():
+            db.session.add(User(email=email, username=f"engine{index}", password_hash=password_hash))
+    db.session.commit()
+"""
+
+WORKER = """
+import json, sys, time
+from app import app
+role, index, count, password, start_at = sys.argv[1], sys.argv[2], int(sys.argv[3]), sys.argv[4], float(sys.argv[5])
+client = app.test_client()
+client.post("/login", data={"email": f"engine{index}@example.com", "password": password})
+time.sleep(max(0.0, start_at - time.time()))
+latencies, failures = [], 0
+started = time.perf_counter()
+for i in range(count):
+    t = time.perf_counter()
+    if role == "writer":
+        status = client.post("/api/results", json={"wpm": 40 + i % 80, "accuracy": 95, "duration": 30}).status_code
+    else:
+        status = client.get("/profile").status_code
+    latencies.append((time.perf_counter() - t) * 1000)
+    failures += status != 200
+print(json.dumps({"role": role, "elapsed": time.perf_counter() - started, "latencies": latencies, "failures": failures}))
+"""
+
+
+def run_profile(profile, args):
+    env = dict(os.environ, PYTHONPATH=str(ROOT), DB_ENGINE_PROFILE=profile, WORDS_RATE_PER_SECOND="0")
+    tmpdir = None
+    if not args.database_url:
+        tmpdir = tempfile.TemporaryDirectory()
+        env["DATABASE_URL"] = f"sqlite:///{Path(tmpdir.name) / 'engine.db'}"
+    else:
+        env["DATABASE_URL"] = args.database_url
+    total = args.writers + args.readers
+    subprocess.run([sys.executable, "-c", SETUP, str(total), PASSWORD], cwd=ROOT, env=env, check=True,
+                   capture_output=True)
+    start_at = time.time() + 2.0  # let every worker finish importing before the clock starts
+    workers = []
+    for index in range(total):
+        role = "writer" if index < args.writers else "reader"
+        workers.append(
+            subprocess.Popen(
+                [sys.executable, "-c", WORKER, role, str(index), str(args.requests), PASSWORD, str(start_at)],
+                cwd=ROOT,
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            )
+        )
+    results = [json.loads(worker.communicate()[0].strip().splitlines()[-1]) for worker in workers]
+    if tmpdir:
+        tmpdir.cleanup()
+    summary = {}
+    for role in ("writer", "reader"):
+        role_results = [r for r in results if r["role"] == role]
+        if not role_results:
+            continue
+        latencies = sorted(l for r in role_results for l in r["latencies"])
+        wall = max(r["elapsed"] for r in role_results)
+        summary[role] = {
+            "requests": len(latencies),
+            "failures": sum(r["failures"] for r in role_results),
+            "throughput_rps": round(len(latencies) / wall, 1),
+            "p50_ms": round(latencies[len(latencies) // 2], 2),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"),
+                        help="shared database; default is a fresh SQLite file per profile")
+    parser.add_argument("--profiles", default="default,tuned")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=200, help="requests per process")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    report = {}
+    for profile in args.profiles.split(","):
+        report[profile] = run_profile(profile, args)
+        for role, stats in report[profile].items():
+            print(
+                f"{profile:<8} {role:<7} {stats['throughput_rps']:>8} req/s  p50 {stats['p50_ms']:>8} ms  "
+                f"p95 {stats['p95_ms']:>8} ms  failed {stats['failures']}/{stats['requests']}"
+            )
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+"""Seed a large database and report query plans and timings for app.py's queries.
+
+Every SQL statement issued while driving the real endpoints is captured and
+EXPLAINed, so a change that drops an index or rewrites a query into a full
+table scan shows up here.
+
+    python scripts/bench_queries.py --rows 2000000 --users 2000
+    DATABASE_URL=postgresql://... python scripts/bench_queries.py --strict
+"""
+
+import argparse
+import base64
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+WATCHED_TABLES = (
+    "test_result",
+    "password_reset_token",
+    "user_stats",
+    "score_histogram",
+    "leaderboard_entry",
+    "keystroke_log",
+    "email_outbox",
+)
+PASSWORD = "bench-pass"
+TABLE_REF = re.compile(r'(?:FROM|JOIN|UPDATE)\s+"?(\w+)"?(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+SQL_KEYWORDS = {"WHERE", "JOIN", "ON", "SET", "GROUP", "ORDER", "LIMIT", "INNER", "LEFT", "WITH"}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--rows", type=int, default=1_000_000, help="test_result rows to seed")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per endpoint")
+    parser.add_argument("--reseed", action="store_true", help="drop existing data before seeding")
+    parser.add_argument("--strict", action="store_true", help="exit 1 if any full table scan is found")
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{ROOT / 'bench.db'}"
+os.environ.setdefault("EMAIL_TRANSPORT", "memory")
+sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import event, func, insert  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from keystrokes import encode_keystrokes  # noqa: E402
+
+from app import (  # noqa: E402
+    KeystrokeLog,
+    PasswordResetToken,
+    TestResult,
+    User,
+    UserStats,
+    WeaknessProfile,
+    app,
+    db,
+    ensure_database,
+)
+
+
+def seed():
+    if args.reseed:
+        for model in (UserStats, PasswordResetToken, WeaknessProfile, KeystrokeLog, TestResult, User):
+            db.session.query(model).delete()
+        db.session.commit()
+    existing = db.session.query(func.count(TestResult.id)).scalar() or 0
+    if existing >= args.rows:
+        print(f"Using existing data ({existing} test_result rows).")
+        return
+    password_hash = generate_password_hash(PASSWORD)
+    user_count = db.session.query(func.count(User.id)).scalar() or 0
+    if user_count < args.users:
+        db.session.execute(
+            insert(User),
+            [
+                {
+                    "email": f"bench{i}@example.com",
+                    "username": f"bench{i}",
+                    "password_hash": password_hash,
+                    "timezone": random.choice(["UTC", "America/Mexico_City", "Europe/Paris"]),
+                }
+                for i in range(user_count, args.users)
+            ],
+        )
+        db.session.commit()
+    user_ids = [row[0] for row in db.session.query(User.id)]
+    now = datetime.utcnow()
+    remaining = args.rows - existing
+    started = time.perf_counter()
+    while remaining > 0:
+        batch = min(remaining, 50_000)
+        rows = []
+        for _ in range(batch):
+            wpm = random.randint(20, 140)
+            rows.append(
+                {
+                    "user_id": random.choice(user_ids),
+                    "wpm": wpm,
+                    "raw_wpm": wpm + random.randint(0, 15),
+                    "accuracy": random.randint(80, 100),
+                    "duration_seconds": random.choice([15, 30, 60, 120]),
+                    "char_count": wpm * 5,
+                    "correct_chars": wpm * 5,
+                    "incorrect_chars": random.randint(0, 20),
+                    "extra_chars": random.randint(0, 5),
+                    "missed_chars": random.randint(0, 5),
+                    "language": random.choice(["en", "es", "fr"]),
+                    "caps_enabled": random.random() < 0.2,
+                    "accents_enabled": random.random() < 0.5,
+                    "punctuation_enabled": random.random() < 0.2,
+                    "hard_mode_enabled": random.random() < 0.05,
+                    "created_at": now - timedelta(seconds=random.randint(0, 730 * 86400)),
+                }
+            )
+        db.session.execute(insert(TestResult.__table__), rows)
+        db.session.commit()
+        remaining -= batch
+    print(f"Seeded {args.rows - existing} test_result rows in {time.perf_counter() - started:.1f}s.")
+
+
+def watched_names(statement):
+    """Watched table names plus any aliases the statement gives them."""
+    names = set(WATCHED_TABLES)
+    for table, alias in TABLE_REF.findall(statement):
+        if table in WATCHED_TABLES and alias and alias.upper() not in SQL_KEYWORDS:
+            names.add(alias)
+    return names
+
+
+def explain(statement, parameters):
+    connection = db.session.connection()
+    names = watched_names(statement)
+    if connection.dialect.name == "postgresql":
+        rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).fetchall()
+        plan = [row[0] for row in rows]
+        scans = [line for line in plan if "Seq Scan on" in line and any(n in line.split() for n in names)]
+    else:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+        plan = [row[-1] for row in rows]
+        scans = [
+            line
+            for line in plan
+            if line.startswith("SCAN ") and "USING" not in line and line.split()[1] in names
+        ]
+    return plan, scans
+
+
+def run_endpoints():
+    user = db.session.query(User).filter(User.username.isnot(None)).order_by(User.id).first()
+    client = app.test_client()
+    client.post("/login", data={"email": user.email, "password": PASSWORD})
+    keystrokes = encode_keystrokes(
+        [(char, random.randint(80, 300), random.random() < 0.05) for char in "the quick brown fox " * 20]
+    )
+    result_payload = {
+        "wpm": 80,
+        "rawWpm": 85,
+        "accuracy": 97,
+        "duration": 30,
+        "chars": 400,
+        "keystrokes": base64.b64encode(keystrokes).decode("ascii"),
+    }
+
+    def cold_profile():
+        db.session.query(UserStats).filter_by(user_id=user.id).delete()
+        db.session.commit()
+        return client.get("/profile")
+
+    def forgot_password():
+        response = client.post("/forgot-password", data={"email": user.email})
+        app.extensions["email_sender"].drain()  # include the sender's queries in the capture
+        return response
+
+    def history_next_page():
+        cursor = client.get("/api/history").get_json()["next_cursor"]
+        return client.get("/api/history", query_string={"cursor": cursor})
+
+    endpoints = [
+        ("GET /", lambda: client.get("/")),
+        ("GET /profile", lambda: client.get("/profile")),
+        ("GET /profile (stats rebuild)", cold_profile),
+        ("POST /api/results", lambda: client.post("/api/results", json=result_payload)),
+        ("GET /api/history", lambda: client.get("/api/history")),
+        ("GET /api/history?cursor=...", history_next_page),
+        ("GET /api/history/series", lambda: client.get("/api/history/series?bucket=week")),
+        ("GET /api/stats", lambda: client.get("/api/stats")),
+        ("GET /api/leaderboard", lambda: client.get("/api/leaderboard")),
+        ("GET /api/keystrokes/heatmap", lambda: client.get("/api/keystrokes/heatmap")),
+        ("GET /api/words?adaptive=true", lambda: client.get("/api/words?adaptive=true&lang=fr")),
+        ("GET /reset/<token>", lambda: client.get("/reset/not-a-real-token")),
+        ("POST /forgot-password (+ outbox delivery)", forgot_password),
+    ]
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith("EXPLAIN"):
+            captured.append((statement, parameters))
+
+    failures = 0
+    for name, call in endpoints:
+        captured.clear()
+        event.listen(db.engine, "before_cursor_execute", capture)
+        response = call()
+        event.remove(db.engine, "before_cursor_execute", capture)
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"\n== {name} -> {response.status_code}")
+        print(
+            f"   median {statistics.median(timings):.2f} ms  "
+            f"max {max(timings):.2f} ms  queries {len(captured)}"
+        )
+        for statement, parameters in captured:
+            if statement.lstrip().upper().startswith("INSERT"):
+                continue
+            plan, scans = explain(statement, parameters)
+            print("   SQL: " + " ".join(statement.split())[:160])
+            for line in plan:
+                print(f"      {line}")
+            for line in scans:
+                failures += 1
+                print(f"   !! full scan: {line}")
+    return failures
+
+
+def main():
+    with app.app_context():
+        ensure_database()
+        seed()
+        failures = run_endpoints()
+    if failures:
+        print(f"\n{failures} full table scan(s) on watched tables.")
+        if args.strict:
+            sys.exit(1)
+    else:
+        print("\nNo full table scans on watched tables.")
+
+
+if __name__ == "__main__":
+    main()
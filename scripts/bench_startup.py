@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""Measure cold-start cost: module import and first-request latency.
+
+Each run starts a fresh interpreter that imports app.py, then serves the
+first /, /api/words and /login requests through the test client, timing each
+step. Reports the median and range over --runs and can write them as JSON.
+
+    python scripts/bench_startup.py --runs 10
+    DATABASE_URL=postgresql://... python scripts/bench_startup.py --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import app as module
+timings = {"import_ms": (time.perf_counter() - started) * 1000}
+client = module.app.test_client()
+for name, path in (("first_index_ms", "/"), ("first_words_ms", "/api/words?count=200"), ("first_login_ms", "/login")):
+    started = time.perf_counter()
+    status = client.get(path).status_code
+    timings[name] = (time.perf_counter() - started) * 1000
+    if status != 200:
+        sys.exit(f"{path} returned {status}")
+timings["heavy_modules"] = sorted(m for m in ("boto3", "authlib", "alembic") if m in sys.modules)
+print(json.dumps(timings))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    runs = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-c", CHILD],
+            cwd=ROOT,
+            env=dict(os.environ, PYTHONPATH=str(ROOT)),
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode != 0:
+            sys.exit(completed.stderr.strip() or completed.stdout.strip())
+        timings = json.loads(completed.stdout.strip().splitlines()[-1])
+        timings["process_ms"] = (time.perf_counter() - started) * 1000
+        runs.append(timings)
+
+    summary = {}
+    for key in ("import_ms", "first_index_ms", "first_words_ms", "first_login_ms", "process_ms"):
+        values = [run[key] for run in runs]
+        summary[key] = {
+            "median": round(statistics.median(values), 1),
+            "min": round(min(values), 1),
+            "max": round(max(values), 1),
+        }
+        print(f"{key:<16} median {summary[key]['median']:>8.1f}  min {summary[key]['min']:>8.1f}  max {summary[key]['max']:>8.1f}")
+    modules = sorted({module for run in runs for module in run["heavy_modules"]})
+    print(f"deferred modules loaded after first requests: {', '.join(modules) or 'none'}")
+    if args.output:
+        Path(args.output).write_text(json.dumps({"runs": len(runs), "summary": summary}, indent=2) + "\n")
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""Fingerprint and precompress static assets for immutable caching.
+
+Copies every file under static/ into static/dist/ with a content hash in its
+name (js/app.js -> js/app.<hash>.js), writes .gz and .br variants where they
+are smaller, and records the mapping in static/dist/manifest.json. Templates
+link assets through asset_url(), which falls back to the plain /static URL
+when the manifest is missing.
+
+    python scripts/build_assets.py
+"""
+
+import gzip
+import hashlib
+import json
+import shutil
+import sys
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # gzip-only builds still work; install Brotli for .br variants
+    brotli = None
+
+ROOT = Path(__file__).resolve().parents[1]
+STATIC_DIR = ROOT / "static"
+DIST_DIR = STATIC_DIR / "dist"
+# Served from a fixed URL (/sw.js), so it is never fingerprinted.
+UNVERSIONED = {"sw.js"}
+# Keep a variant only if it saves at least this fraction of the original size.
+MIN_SAVING = 0.1
+
+
+def fingerprinted_name(relative, content):
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    return relative.with_name(f"{relative.stem}.{digest}{relative.suffix}")
+
+
+def write_variant(target, data, original_size):
+    if len(data) > original_size * (1 - MIN_SAVING):
+        return None
+    target.write_bytes(data)
+    return len(data)
+
+
+def main():
+    if DIST_DIR.exists():
+        shutil.rmtree(DIST_DIR)
+    sources = sorted(
+        path
+        for path in STATIC_DIR.rglob("*")
+        if path.is_file() and DIST_DIR not in path.parents and path.name not in UNVERSIONED
+    )
+    manifest = {}
+    for source in sources:
+        relative = source.relative_to(STATIC_DIR)
+        content = source.read_bytes()
+        name = fingerprinted_name(relative, content)
+        target = DIST_DIR / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+        # mtime=0 keeps the .gz bytes identical across builds of the same input.
+        gz_size = write_variant(
+            target.with_name(target.name + ".gz"), gzip.compress(content, compresslevel=9, mtime=0), len(content)
+        )
+        br_size = None
+        if brotli is not None:
+            br_size = write_variant(
+                target.with_name(target.name + ".br"), brotli.compress(content, quality=11), len(content)
+            )
+        manifest[relative.as_posix()] = name.as_posix()
+        print(f"{relative.as_posix():<24} -> {name.as_posix():<32} {len(content):>8} B  gz {gz_size or '-':>8}  br {br_size or '-':>8}")
+    (DIST_DIR / "manifest.json").write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+    if brotli is None:
+        print("Brotli is not installed; wrote gzip variants only.", file=sys.stderr)
+    print(f"Wrote {len(manifest)} assets to {DIST_DIR.relative_to(ROOT)}/")
+
+
+if __name__ == "__main__":
+    main()
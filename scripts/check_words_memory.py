@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""Check that pathological /api/words requests keep peak memory bounded.
+
+Drives the app in-process and measures the Python heap peak with tracemalloc
+while it rejects oversized JSON requests and streams the largest allowed
+NDJSON/text responses. Exits non-zero if any peak exceeds --limit-mib.
+
+    python scripts/check_words_memory.py
+"""
+
+import argparse
+import os
+import sys
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+sys.path.insert(0, str(ROOT))
+
+from app import WORDS_STREAM_MAX_COUNT, app  # noqa: E402
+
+
+def measure(client, url, remote_addr):
+    tracemalloc.start()
+    response = client.get(url, buffered=False, environ_base={"REMOTE_ADDR": remote_addr})
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return response.status_code, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit-mib", type=float, default=4.0)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    client.get("/api/words?count=1&lang=fr")  # load the stores outside the measurement
+    client.get("/api/words?count=1&lang=es")
+    cases = [
+        ("/api/words?count=100000000", 400),
+        ("/api/words?count=100000000&format=ndjson", 400),
+        (f"/api/words?count={WORDS_STREAM_MAX_COUNT}&lang=fr&format=ndjson", 200),
+        (f"/api/words?count={WORDS_STREAM_MAX_COUNT}&lang=fr&format=text&punctuation=1", 200),
+        (f"/api/words?count={WORDS_STREAM_MAX_COUNT}&lang=es&format=text&difficulty=hard", 200),
+    ]
+    # Each case gets its own client address so the real limiter sees a full
+    # bucket; the last case repeats a stream from a drained one.
+    cases = [(url, expected, f"10.0.0.{i}") for i, (url, expected) in enumerate(cases, 1)]
+    cases.append((f"/api/words?count={WORDS_STREAM_MAX_COUNT}&lang=fr&format=ndjson", 429, cases[-1][2]))
+    failed = False
+    for url, expected, remote_addr in cases:
+        status, size, peak = measure(client, url, remote_addr)
+        peak_mib = peak / 2**20
+        ok = status == expected and peak_mib <= args.limit_mib
+        failed |= not ok
+        print(f"{'ok ' if ok else 'BAD'} {status} {size:>10} bytes  peak {peak_mib:6.2f} MiB  {url}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
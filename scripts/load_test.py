@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+"""Seed synthetic users and results, then load-test the main endpoints.
+
+Each endpoint is driven by --concurrency threads (one logged-in user each)
+for --requests requests, either in-process through the Flask test client or
+against a running server with --url. /profile is measured once per history
+size tier so latency growth with history is visible. Reports throughput,
+p50/p95/p99 latency and (in-process only) SQL statements per request, and
+writes the numbers as JSON for comparing runs.
+
+    python scripts/load_test.py --history 0,100,10000 --output run.json
+    python scripts/load_test.py --baseline run.json
+    gunicorn app:app -w 4 &  # same DATABASE_URL as below
+    python scripts/load_test.py --url http://127.0.0.1:8000
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+PASSWORD = "load-pass"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--url", help="base URL of a running server; default drives the app in-process")
+    parser.add_argument("--users", type=int, default=20, help="users per history tier")
+    parser.add_argument(
+        "--history", default="0,100,1000", help="comma-separated results per user, one tier each"
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=400, help="requests per endpoint")
+    parser.add_argument("--reseed", action="store_true", help="drop existing data before seeding")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{ROOT / 'loadtest.db'}"
+if not args.url:
+    # The per-client words throttle would otherwise dominate in-process numbers.
+    os.environ.setdefault("WORDS_RATE_PER_SECOND", "0")
+sys.path.insert(0, str(ROOT))
+
+import requests  # noqa: E402
+from sqlalchemy import event, func, insert  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import (  # noqa: E402
+    KeystrokeLog,
+    LeaderboardEntry,
+    PasswordResetToken,
+    ScoreHistogram,
+    TestResult,
+    User,
+    UserStats,
+    WeaknessProfile,
+    app,
+    db,
+    ensure_database,
+    rebuild_histograms,
+    rebuild_leaderboards,
+    rebuild_user_stats,
+)
+
+
+def tier_email(history, index):
+    return f"load{history}-{index}@example.com"
+
+
+def seed(tiers):
+    if args.reseed:
+        for model in (
+            ScoreHistogram,
+            LeaderboardEntry,
+            UserStats,
+            PasswordResetToken,
+            WeaknessProfile,
+            KeystrokeLog,
+            TestResult,
+            User,
+        ):
+            db.session.query(model).delete()
+        db.session.commit()
+    password_hash = generate_password_hash(PASSWORD)
+    now = datetime.utcnow()
+    seeded = 0
+    for history in tiers:
+        emails = [tier_email(history, i) for i in range(args.users)]
+        existing = {row[0] for row in db.session.query(User.email).filter(User.email.in_(emails))}
+        missing = [email for email in emails if email not in existing]
+        if not missing:
+            continue
+        db.session.execute(
+            insert(User),
+            [
+                {"email": email, "username": email.split("@")[0], "password_hash": password_hash}
+                for email in missing
+            ],
+        )
+        user_ids = [row[0] for row in db.session.query(User.id).filter(User.email.in_(missing))]
+        rows = []
+        for user_id in user_ids:
+            for _ in range(history):
+                wpm = random.randint(20, 140)
+                rows.append(
+                    {
+                        "user_id": user_id,
+                        "wpm": wpm,
+                        "raw_wpm": wpm + random.randint(0, 15),
+                        "accuracy": random.randint(80, 100),
+                        "duration_seconds": random.choice([15, 30, 60, 120]),
+                        "char_count": wpm * 5,
+                        "correct_chars": wpm * 5,
+                        "language": random.choice(["en", "es", "fr"]),
+                        "caps_enabled": random.random() < 0.2,
+                        "accents_enabled": random.random() < 0.5,
+                        "punctuation_enabled": random.random() < 0.2,
+                        "hard_mode_enabled": random.random() < 0.05,
+                        "created_at": now - timedelta(seconds=random.randint(0, 730 * 86400)),
+                    }
+                )
+                if len(rows) >= 50_000:
+                    db.session.execute(insert(TestResult.__table__), rows)
+                    rows.clear()
+        if rows:
+            db.session.execute(insert(TestResult.__table__), rows)
+        db.session.commit()
+        seeded += len(missing)
+    if seeded:
+        rebuild_user_stats()
+        rebuild_leaderboards()
+        rebuild_histograms()
+        db.session.commit()
+    total = db.session.query(func.count(TestResult.id)).scalar()
+    print(f"Seeded {seeded} users; {total} test_result rows in total.")
+
+
+class QueryCounter:
+    """Counts SQL statements issued by the current thread (in-process mode only)."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.local.count = getattr(self.local, "count", 0) + 1
+
+    def take(self):
+        count = getattr(self.local, "count", 0)
+        self.local.count = 0
+        return count
+
+
+class InProcessClient:
+    def __init__(self, email):
+        self.client = app.test_client()
+        self.client.post("/login", data={"email": email, "password": PASSWORD})
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body)
+        response.close()
+        return response.status_code
+
+
+class HttpClient:
+    def __init__(self, email):
+        self.session = requests.Session()
+        self.session.post(
+            f"{args.url}/login", data={"email": email, "password": PASSWORD}, allow_redirects=False
+        )
+
+    def request(self, method, path, body=None):
+        return self.session.request(method, f"{args.url}{path}", json=body).status_code
+
+
+def result_payload():
+    wpm = random.randint(20, 140)
+    return {
+        "wpm": wpm,
+        "rawWpm": wpm + 5,
+        "accuracy": random.randint(80, 100),
+        "duration": random.choice([15, 30, 60]),
+        "chars": wpm * 5,
+        "language": "en",
+    }
+
+
+def words_request():
+    return "GET", f"/api/words?count=200&seed={random.getrandbits(32)}", None
+
+
+def scenarios(tiers):
+    yield "GET /", tiers[0], lambda: ("GET", "/", None)
+    yield "GET /api/words", tiers[0], words_request
+    yield "POST /api/results", tiers[0], lambda: ("POST", "/api/results", result_payload())
+    for history in tiers:
+        yield f"GET /profile [history={history}]", history, lambda: ("GET", "/profile", None)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(make_client, counter, history, build_request):
+    clients = [make_client(tier_email(history, i % args.users)) for i in range(args.concurrency)]
+    latencies, queries, errors = [], [], []
+    remaining = iter(range(args.requests))
+    lock = threading.Lock()
+
+    def worker(client):
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            method, path, body = build_request()
+            if counter:
+                counter.take()
+            started = time.perf_counter()
+            status = client.request(method, path, body)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if counter:
+                    queries.append(counter.take())
+                if status >= 400:
+                    errors.append(status)
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / wall, 1),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "queries_per_request": round(statistics.fmean(queries), 1) if queries else None,
+    }
+
+
+def print_report(results, baseline):
+    header = f"{'endpoint':<32} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'sql':>6} {'err':>5}"
+    print("\n" + header)
+    print("-" * len(header))
+    for name, stats in results.items():
+        sql = "-" if stats["queries_per_request"] is None else stats["queries_per_request"]
+        line = (
+            f"{name:<32} {stats['throughput_rps']:>8} {stats['p50_ms']:>8} "
+            f"{stats['p95_ms']:>8} {stats['p99_ms']:>8} {sql:>6} {stats['errors']:>5}"
+        )
+        previous = baseline.get(name)
+        if previous:
+            change = (stats["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100
+            line += f"  p95 {change:+.0f}% vs baseline"
+        print(line)
+
+
+def main():
+    tiers = sorted({int(value) for value in args.history.split(",") if value.strip()})
+    baseline = {}
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["endpoints"]
+    with app.app_context():
+        ensure_database()
+        seed(tiers)
+        backend = db.engine.url.get_backend_name()
+    counter = None
+    if args.url:
+        make_client = HttpClient
+    else:
+        make_client = InProcessClient
+        counter = QueryCounter()
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", counter)
+    results = {}
+    for name, history, build_request in scenarios(tiers):
+        results[name] = run_scenario(make_client, counter, history, build_request)
+        print(f"{name}: {results[name]['throughput_rps']} req/s", flush=True)
+    print_report(results, baseline)
+    if args.output:
+        report = {
+            "meta": {
+                "started_at": datetime.utcnow().isoformat(),
+                "target": args.url or "in-process",
+                "database": backend,
+                "users_per_tier": args.users,
+                "history_tiers": tiers,
+                "concurrency": args.concurrency,
+                "requests_per_endpoint": args.requests,
+            },
+            "endpoints": results,
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"\nWrote {args.output}")
+    failed = sum(stats["errors"] for stats in results.values())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -37,6 +37,13 @@ curl -s -o /dev/null -w "%{http_code}" -b "${COOKIE_JAR}" -H "Content-Type: appl
   exit 1
 }
 
+curl -s -o /dev/null -w "%{http_code}" -b "${COOKIE_JAR}" -H "Content-Type: application/json" \
+  -d '{"results":[{"clientId":"smoke-1","wpm":70,"rawWpm":75,"accuracy":97,"duration":30,"chars":180}]}' \
+  "${BASE_URL}/api/results/batch" | grep -q "200" || {
+  echo "Batch results save failed"
+  exit 1
+}
+
 curl -s -o /dev/null -w "%{http_code}" -b "${COOKIE_JAR}" "${BASE_URL}/profile" | grep -q "200" || {
   echo "Profile failed"
   exit 1
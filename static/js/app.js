@@ -15,12 +15,16 @@ const accentToggle = document.getElementById("accentToggle");
 const punctuationToggle = document.getElementById("punctuationToggle");
 const numbersToggle = document.getElementById("numbersToggle");
 const hardModeToggle = document.getElementById("hardModeToggle");
+const adaptiveToggle = document.getElementById("adaptiveToggle");
+const difficultyToggle = document.getElementById("difficultyToggle");
 const resultsScreen = document.getElementById("resultsScreen");
 const resultWpm = document.getElementById("resultWpm");
 const resultRawWpm = document.getElementById("resultRawWpm");
 const resultAccuracy = document.getElementById("resultAccuracy");
 const resultChars = document.getElementById("resultChars");
 const resultDuration = document.getElementById("resultDuration");
+const resultPercentileCard = document.getElementById("resultPercentileCard");
+const resultPercentile = document.getElementById("resultPercentile");
 const themeMenuToggle = document.getElementById("themeMenuToggle");
 const themeMenu = document.getElementById("themeMenu");
 const themeLabel = document.getElementById("themeLabel");
@@ -50,6 +54,14 @@ let infiniteMode = false;
 let wordResults = [];
 let typedWords = [];
 let windowStartIndex = 0;
+let wordSeed = "";
+let wordPage = 0;
+let prefetchedWords = null;
+let refillPending = false;
+const wordsBatchSize = 200;
+const wordPacks = new Map();
+// language -> whether its pack has difficulty tiers, once a pack has loaded.
+const rankedLanguages = new Map();
 const wordsPerView = 18;
 const capitalizeStorageKey = "typing-capitalize";
 let capitalizeEnabled = localStorage.getItem(capitalizeStorageKey) === "true";
@@ -63,6 +75,14 @@ const numbersStorageKey = "typing-numbers";
 let numbersEnabled = localStorage.getItem(numbersStorageKey) === "true";
 const hardModeStorageKey = "typing-hard-mode";
 let hardModeEnabled = localStorage.getItem(hardModeStorageKey) === "true";
+const difficultyStorageKey = "typing-difficulty";
+const difficulties = ["easy", "medium", "hard"];
+let currentDifficulty = localStorage.getItem(difficultyStorageKey) || "";
+if (!difficulties.includes(currentDifficulty)) {
+  currentDifficulty = "";
+}
+const adaptiveStorageKey = "typing-adaptive";
+let adaptiveEnabled = Boolean(adaptiveToggle) && localStorage.getItem(adaptiveStorageKey) === "true";
 const colorThemeStorageKey = "typing-color-theme";
 const supportedLanguages = ["en", "es", "fr", "de", "pt"];
 const accentLanguages = new Set(["es", "fr", "de", "pt"]);
@@ -337,65 +357,6 @@ function applyCapitalizeToggle() {
   capitalizeToggle.classList.toggle("opacity-50", !capitalizeEnabled);
 }
 
-function maybeCapitalize(word) {
-  if (!capitalizeEnabled || word.length === 0) {
-    return word;
-  }
-  if (Math.random() < 0.3) {
-    return `${word[0].toUpperCase()}${word.slice(1)}`;
-  }
-  return word;
-}
-
-function stripAccents(word) {
-  return word.normalize("NFD").replace(/[\u0300-\u036f]/g, "");
-}
-
-function maybePunctuate(word) {
-  if (!punctuationEnabled || word.length === 0) {
-    return word;
-  }
-  if (Math.random() > 0.25) {
-    return word;
-  }
-  const wrappers = [
-    (w) => `(${w})`,
-    (w) => `"${w}"`,
-  ];
-  const suffixes = [",", ".", ";", ":", "!", "?", "..."];
-  const specials = [
-    (w) => `${w}'s`,
-    (w) => `${w}-${w}`,
-    (w) => `${w}—${w}`,
-  ];
-  const roll = Math.random();
-  if (roll < 0.2) {
-    const wrap = wrappers[Math.floor(Math.random() * wrappers.length)];
-    return wrap(word);
-  }
-  if (roll < 0.6) {
-    const suffix = suffixes[Math.floor(Math.random() * suffixes.length)];
-    return `${word}${suffix}`;
-  }
-  const special = specials[Math.floor(Math.random() * specials.length)];
-  return special(word);
-}
-
-function maybeNumber(word) {
-  if (!numbersEnabled) {
-    return word;
-  }
-  if (Math.random() > 0.2) {
-    return word;
-  }
-  const length = Math.floor(Math.random() * 4) + 1;
-  let value = "";
-  for (let i = 0; i < length; i += 1) {
-    value += Math.floor(Math.random() * 10).toString();
-  }
-  return value;
-}
-
 function applyAccentToggle() {
   if (!accentToggle) {
     return;
@@ -452,6 +413,18 @@ function applyHardModeToggle() {
   hardModeToggle.classList.toggle("opacity-50", !hardModeEnabled);
 }
 
+function applyAdaptiveToggle() {
+  if (!adaptiveToggle) {
+    return;
+  }
+  adaptiveToggle.setAttribute("aria-pressed", String(adaptiveEnabled));
+  adaptiveToggle.classList.toggle("bg-emerald-500/20", adaptiveEnabled);
+  adaptiveToggle.classList.toggle("text-emerald-200", adaptiveEnabled);
+  adaptiveToggle.classList.toggle("border-emerald-400/60", adaptiveEnabled);
+  adaptiveToggle.classList.toggle("shadow-[0_0_14px_rgba(16,185,129,0.35)]", adaptiveEnabled);
+  adaptiveToggle.classList.toggle("opacity-50", !adaptiveEnabled);
+}
+
 function applyLanguageToggle() {
   if (!languageToggle) {
     return;
@@ -484,7 +457,64 @@ async function setLanguage(nextLanguage) {
   textInput.focus();
 }
 
+// Per-keystroke timings, encoded as described in keystrokes.py: the expected
+// character (as an index into a per-test alphabet), an error bit and the
+// milliseconds since the previous press, all as varints.
+const keystrokeLimit = 4000;
+const keystrokeIntervalMax = 16383;
+let keystrokeLog = newKeystrokeLog();
+
+function newKeystrokeLog() {
+  return { alphabet: [], indexes: new Map(), bytes: [], count: 0, last: null };
+}
+
+function pushVarint(bytes, value) {
+  let remaining = value;
+  while (remaining >= 0x80) {
+    bytes.push((remaining & 0x7f) | 0x80);
+    remaining = Math.floor(remaining / 128);
+  }
+  bytes.push(remaining);
+}
+
+function recordKeystroke(expected, isError) {
+  const log = keystrokeLog;
+  if (log.count >= keystrokeLimit) {
+    return;
+  }
+  const now = performance.now();
+  const interval = log.last === null ? 0 : Math.min(Math.round(now - log.last), keystrokeIntervalMax);
+  log.last = now;
+  let index = log.indexes.get(expected);
+  if (index === undefined) {
+    index = log.alphabet.length;
+    log.alphabet.push(expected);
+    log.indexes.set(expected, index);
+  }
+  pushVarint(log.bytes, interval);
+  pushVarint(log.bytes, index * 2 + (isError ? 1 : 0));
+  log.count += 1;
+}
+
+function encodeKeystrokes() {
+  const log = keystrokeLog;
+  if (log.count === 0) {
+    return null;
+  }
+  const alphabet = new TextEncoder().encode(log.alphabet.join(""));
+  const bytes = [1];
+  pushVarint(bytes, alphabet.length);
+  bytes.push(...alphabet);
+  pushVarint(bytes, log.count);
+  let binary = String.fromCharCode(...bytes);
+  for (let start = 0; start < log.bytes.length; start += 4096) {
+    binary += String.fromCharCode(...log.bytes.slice(start, start + 4096));
+  }
+  return btoa(binary);
+}
+
 function resetStats() {
+  keystrokeLog = newKeystrokeLog();
   currentIndex = 0;
   correctKeystrokes = 0;
   incorrectKeystrokes = 0;
@@ -546,6 +576,7 @@ function showResultsScreen() {
   if (resultAccuracy) resultAccuracy.textContent = `${accuracy}%`;
   if (resultChars) resultChars.textContent = String(totalChars);
   if (resultDuration) resultDuration.textContent = `${durationSeconds}s`;
+  if (resultPercentileCard) resultPercentileCard.classList.add("hidden");
   resultsScreen.classList.remove("hidden");
   resultsScreen.classList.add("flex");
   textInput.disabled = true;
@@ -565,6 +596,7 @@ function showResultsScreen() {
     punctuationEnabled: punctuationEnabled,
     hardModeEnabled: hardModeEnabled,
     timezone,
+    keystrokes: encodeKeystrokes(),
   });
 }
 
@@ -887,25 +919,277 @@ function stopTest(showResults = false) {
   }
 }
 
+function newWordSeed() {
+  const values = new Uint32Array(2);
+  crypto.getRandomValues(values);
+  return Array.from(values, (value) => value.toString(36)).join("");
+}
+
+function wordsUrl(page) {
+  const params = new URLSearchParams({
+    count: String(wordsBatchSize),
+    lang: currentLanguage,
+    accents: String(!accentLanguages.has(currentLanguage) || accentsEnabled),
+    caps: String(capitalizeEnabled),
+    punctuation: String(punctuationEnabled),
+    numbers: String(numbersEnabled),
+    seed: wordSeed,
+    page: String(page),
+  });
+  // The server rejects a difficulty for a list without frequency ranks.
+  if (currentDifficulty && rankedLanguages.get(currentLanguage)) {
+    params.set("difficulty", currentDifficulty);
+  }
+  if (adaptiveEnabled) {
+    params.set("adaptive", "true");
+  }
+  return `/api/words?${params.toString()}`;
+}
+
+async function loadWordsPage(url) {
+  const response = await fetch(url);
+  if (!response.ok) {
+    throw new Error(`Words request failed: ${response.status}`);
+  }
+  return response.json();
+}
+
+function prefetchNextWordsPage() {
+  const url = wordsUrl(wordPage + 1);
+  const request = loadWordsPage(url);
+  request.catch(() => {});
+  prefetchedWords = { url, request };
+}
+
+// Server-side sampling: weak-key practice, or the fallback while no language
+// pack is available.
+async function fetchServerWords(replace) {
+  if (currentDifficulty && !rankedLanguages.has(currentLanguage)) {
+    // The pack says whether the list is ranked; without it the difficulty is left out.
+    applyDifficultyToggle(await loadWordPack(currentLanguage));
+  }
+  if (replace) {
+    wordSeed = newWordSeed();
+    wordPage = 0;
+  }
+  const page = replace ? 0 : wordPage + 1;
+  const url = wordsUrl(page);
+  const pending =
+    prefetchedWords && prefetchedWords.url === url ? prefetchedWords.request : loadWordsPage(url);
+  prefetchedWords = null;
+  const data = await pending;
+  wordPage = page;
+  prefetchNextWordsPage();
+  return data.words || [];
+}
+
+function stripAccents(word) {
+  return word.normalize("NFD").replace(/[\u0300-\u036f]/g, "");
+}
+
+// "easy:0-1000:zipf,medium:1000-5000:zipf,hard:5000-9915:uniform" ->
+// { easy: { start: 0, size: 1000, zipf: true }, ... }. Tiers are rank ranges of
+// the pack, which lists words most frequent first; unranked packs have none.
+function parsePackTiers(header) {
+  const tiers = {};
+  (header || "").split(",").forEach((entry) => {
+    const [name, range, weighting] = entry.split(":");
+    const [start, end] = (range || "").split("-").map(Number);
+    if (name && end > start) {
+      tiers[name] = { start, size: end - start, zipf: weighting === "zipf" };
+    }
+  });
+  return tiers;
+}
+
+// The whole word list for a language, fetched once (and kept offline by the
+// service worker). Resolves to null when the pack cannot be loaded.
+function loadWordPack(language) {
+  if (!wordPacks.has(language)) {
+    const request = fetch(`/api/packs/${language}`)
+      .then(async (response) => {
+        if (!response.ok) {
+          throw new Error(`Pack request failed: ${response.status}`);
+        }
+        const pack = {
+          words: (await response.text()).split("\n").filter(Boolean),
+          plain: null,
+          tiers: parsePackTiers(response.headers.get("X-Pack-Tiers")),
+          aliases: {},
+        };
+        rankedLanguages.set(language, Object.keys(pack.tiers).length > 0);
+        return pack;
+      })
+      .catch((error) => {
+        console.error(error);
+        wordPacks.delete(language);
+        return null;
+      });
+    wordPacks.set(language, request);
+  }
+  return wordPacks.get(language);
+}
+
+function randomInt(max) {
+  return Math.floor(Math.random() * max);
+}
+
+function randomChoice(items) {
+  return items[randomInt(items.length)];
+}
+
+const punctuationWrappers = [(word) => `(${word})`, (word) => `"${word}"`];
+const punctuationSuffixes = [",", ".", ";", ":", "!", "?", "..."];
+const punctuationSpecials = [
+  (word) => `${word}'s`,
+  (word) => `${word}-${word}`,
+  (word) => `${word}\u2014${word}`,
+];
+
+// Same transforms and odds as word_store.transform_words on the server.
+function transformWords(list) {
+  const result = list.slice();
+  if (capitalizeEnabled) {
+    result.forEach((word, index) => {
+      if (Math.random() < 0.3 && word) {
+        result[index] = word[0].toUpperCase() + word.slice(1);
+      }
+    });
+  }
+  if (numbersEnabled) {
+    result.forEach((word, index) => {
+      if (Math.random() <= 0.2) {
+        const digits = 1 + randomInt(4);
+        result[index] = Array.from({ length: digits }, () => String(randomInt(10))).join("");
+      }
+    });
+  }
+  if (punctuationEnabled) {
+    result.forEach((word, index) => {
+      if (Math.random() > 0.25 || !word) {
+        return;
+      }
+      const style = Math.random();
+      if (style < 0.2) {
+        result[index] = randomChoice(punctuationWrappers)(word);
+      } else if (style < 0.6) {
+        result[index] = word + randomChoice(punctuationSuffixes);
+      } else {
+        result[index] = randomChoice(punctuationSpecials)(word);
+      }
+    });
+  }
+  return result;
+}
+
+// Vose alias table over the Zipf-Mandelbrot weights word_store uses for a
+// tier of `size` words: rank r is drawn with weight 1 / (r + size / 10).
+function zipfAliasTable(size) {
+  const flatten = Math.max(1, size / 10);
+  let total = 0;
+  for (let rank = 0; rank < size; rank += 1) {
+    total += 1 / (rank + flatten);
+  }
+  const scaled = new Float64Array(size);
+  const small = [];
+  const large = [];
+  for (let rank = 0; rank < size; rank += 1) {
+    scaled[rank] = (size / (rank + flatten)) / total;
+    (scaled[rank] < 1 ? small : large).push(rank);
+  }
+  const probabilities = new Float64Array(size).fill(1);
+  const aliases = Uint32Array.from({ length: size }, (_, index) => index);
+  while (small.length && large.length) {
+    const less = small.pop();
+    const more = large.pop();
+    probabilities[less] = scaled[less];
+    aliases[less] = more;
+    scaled[more] -= 1 - scaled[less];
+    (scaled[more] < 1 ? small : large).push(more);
+  }
+  return { probabilities, aliases };
+}
+
+function sampleTier(pack, source, count) {
+  const { start, zipf } = pack.tiers[currentDifficulty];
+  const size = Math.min(pack.tiers[currentDifficulty].size, source.length - start);
+  if (zipf && !pack.aliases[currentDifficulty]) {
+    pack.aliases[currentDifficulty] = zipfAliasTable(size);
+  }
+  const table = zipf ? pack.aliases[currentDifficulty] : null;
+  const picked = [];
+  let previous = -1;
+  while (picked.length < count) {
+    let index = randomInt(size);
+    if (table && Math.random() >= table.probabilities[index]) {
+      index = table.aliases[index];
+    }
+    if (index !== previous || size === 1) {
+      previous = index;
+      picked.push(source[start + index]);
+    }
+  }
+  return picked;
+}
+
+// Difficulty only applies to ranked word lists; the selector is disabled for the others.
+function applyDifficultyToggle(pack) {
+  if (!difficultyToggle || !pack) {
+    return;
+  }
+  const ranked = Object.keys(pack.tiers).length > 0;
+  difficultyToggle.disabled = !ranked;
+  difficultyToggle.title = ranked ? "" : "This word list has no frequency ranks";
+}
+
+async function sampleLocalWords(count) {
+  const pack = await loadWordPack(currentLanguage);
+  applyDifficultyToggle(pack);
+  if (!pack || pack.words.length === 0) {
+    return null;
+  }
+  let source = pack.words;
+  if (accentLanguages.has(currentLanguage) && !accentsEnabled) {
+    pack.plain = pack.plain || pack.words.map(stripAccents);
+    source = pack.plain;
+  }
+  if (currentDifficulty && pack.tiers[currentDifficulty]) {
+    return transformWords(sampleTier(pack, source, count));
+  }
+  const picked = [];
+  if (count <= source.length) {
+    const seen = new Set();
+    while (picked.length < count) {
+      const index = randomInt(source.length);
+      if (!seen.has(index)) {
+        seen.add(index);
+        picked.push(source[index]);
+      }
+    }
+  } else {
+    for (let i = 0; i < count; i += 1) {
+      picked.push(source[randomInt(source.length)]);
+    }
+  }
+  return transformWords(picked);
+}
+
 async function fetchWords({ replace = false } = {}) {
-  let data = null;
+  if (!replace && refillPending) {
+    return;
+  }
+  let incoming = null;
+  refillPending = !replace;
   try {
-    const response = await fetch(`/api/words?count=200&lang=${encodeURIComponent(currentLanguage)}`);
-    if (!response.ok) {
-      throw new Error(`Words request failed: ${response.status}`);
-    }
-    data = await response.json();
+    // Weak-key practice depends on the server-side profile, so it skips the local pack.
+    const local = adaptiveEnabled ? null : await sampleLocalWords(wordsBatchSize);
+    incoming = local || (await fetchServerWords(replace));
   } catch (error) {
     console.error(error);
     return;
+  } finally {
+    refillPending = false;
   }
-  const incoming = (data.words || [])
-    .map((word) =>
-      accentLanguages.has(currentLanguage) && !accentsEnabled ? stripAccents(word) : word,
-    )
-    .map((word) => maybeCapitalize(word))
-    .map((word) => maybeNumber(word))
-    .map((word) => maybePunctuate(word));
   if (replace || words.length === 0) {
     words = incoming;
   } else {
@@ -943,6 +1227,7 @@ textInput.addEventListener("keydown", (event) => {
     return;
   }
   if (event.key === "Backspace" || event.key === "Delete") {
+    recordKeystroke("\b", false);
     incorrectKeystrokes += 1;
     updateStats();
     return;
@@ -957,6 +1242,8 @@ textInput.addEventListener("keydown", (event) => {
   const value = textInput.value;
   const caretPos = textInput.selectionStart ?? value.length;
   const expected = getExpectedCharAt(caretPos);
+  // Past the end of the word the only useful key is space.
+  recordKeystroke(expected ?? " ", key !== expected);
   if (key === expected) {
     correctKeystrokes += 1;
   } else {
@@ -996,6 +1283,17 @@ if (languageToggle) {
   }
 }
 
+if (difficultyToggle) {
+  difficultyToggle.value = currentDifficulty;
+  difficultyToggle.addEventListener("change", async () => {
+    currentDifficulty = difficulties.includes(difficultyToggle.value) ? difficultyToggle.value : "";
+    localStorage.setItem(difficultyStorageKey, currentDifficulty);
+    await fetchWords({ replace: true });
+    resetStats();
+    textInput.focus();
+  });
+}
+
 if (accentToggle) {
   applyAccentToggle();
   accentToggle.addEventListener("click", async () => {
@@ -1032,6 +1330,18 @@ if (numbersToggle) {
   });
 }
 
+if (adaptiveToggle) {
+  applyAdaptiveToggle();
+  adaptiveToggle.addEventListener("click", async () => {
+    adaptiveEnabled = !adaptiveEnabled;
+    localStorage.setItem(adaptiveStorageKey, String(adaptiveEnabled));
+    applyAdaptiveToggle();
+    await fetchWords({ replace: true });
+    resetStats();
+    textInput.focus();
+  });
+}
+
 if (hardModeToggle) {
   applyHardModeToggle();
   hardModeToggle.addEventListener("click", () => {
@@ -1094,6 +1404,10 @@ fetchWords({ replace: true }).then(() => {
   focusTypingInput();
 });
 
+if ("serviceWorker" in navigator) {
+  navigator.serviceWorker.register("/sw.js").catch((error) => console.error(error));
+}
+
 setUserTimezone();
 
 document.addEventListener("pointerdown", (event) => {
@@ -1122,21 +1436,108 @@ document.addEventListener("keydown", (event) => {
   focusTypingInput();
 });
 
-async function recordResult(payload) {
-  if (!isAuthenticated) {
+const pendingResultsStorageKey = "typing-pending-results";
+const resultsBatchSize = 20;
+let flushingResults = false;
+let pendingResultsFallback = null;
+let lastResultClientId = null;
+
+function readPendingResults() {
+  if (pendingResultsFallback) {
+    return pendingResultsFallback.slice();
+  }
+  try {
+    const stored = JSON.parse(localStorage.getItem(pendingResultsStorageKey) || "[]");
+    return Array.isArray(stored) ? stored : [];
+  } catch (error) {
+    return [];
+  }
+}
+
+function writePendingResults(pending) {
+  try {
+    localStorage.setItem(pendingResultsStorageKey, JSON.stringify(pending));
+    pendingResultsFallback = null;
+  } catch (error) {
+    // Storage full or unavailable; keep the queue in memory for this session.
+    pendingResultsFallback = pending.slice();
+  }
+}
+
+function newClientId() {
+  if (crypto.randomUUID) {
+    return crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${newWordSeed()}`;
+}
+
+async function flushPendingResults() {
+  if (!isAuthenticated || flushingResults || !navigator.onLine) {
     return;
   }
+  flushingResults = true;
   try {
-    await fetch("/api/results", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify(payload),
-    });
+    // Results queued without a clientId cannot be deduplicated, so the server refuses them.
+    let pending = readPendingResults().map((item) =>
+      item.clientId ? item : { ...item, clientId: newClientId() }
+    );
+    writePendingResults(pending);
+    while (pending.length > 0) {
+      const batch = pending.slice(0, resultsBatchSize);
+      const response = await fetch("/api/results/batch", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          results: batch,
+          timezone: Intl.DateTimeFormat().resolvedOptions().timeZone || "",
+        }),
+      });
+      if (!response.ok) {
+        break;
+      }
+      const data = await response.json();
+      showResultPercentile((data.percentiles || {})[lastResultClientId]);
+      const settled = new Set([
+        ...(data.accepted || []),
+        ...(data.duplicates || []),
+        ...(data.rejected || []),
+      ]);
+      if (settled.size === 0) {
+        break;
+      }
+      pending = readPendingResults().filter((item) => !settled.has(item.clientId));
+      writePendingResults(pending);
+    }
   } catch (error) {
-    // Ignore save errors; results are still visible locally.
+    // Offline or server unavailable; queued results are retried later.
+  } finally {
+    flushingResults = false;
   }
 }
 
+function showResultPercentile(percentile) {
+  if (!percentile || percentile.wpm === null || !resultPercentile || !resultPercentileCard) {
+    return;
+  }
+  const accuracy = percentile.accuracy === null ? "" : ` \u00b7 ${percentile.accuracy}% acc`;
+  resultPercentile.textContent = `${percentile.wpm}%${accuracy}`;
+  resultPercentileCard.classList.remove("hidden");
+}
+
+function recordResult(payload) {
+  if (!isAuthenticated) {
+    return;
+  }
+  const pending = readPendingResults();
+  lastResultClientId = newClientId();
+  pending.push({ ...payload, clientId: lastResultClientId, completedAt: Date.now() });
+  writePendingResults(pending);
+  flushPendingResults();
+}
+
+window.addEventListener("online", flushPendingResults);
+flushPendingResults();
+
 async function setUserTimezone() {
   if (!isAuthenticated) {
     return;
@@ -0,0 +1,84 @@
+// Keeps language packs, fingerprinted assets and the last-seen pages available
+// offline. Served from /sw.js so its scope is the whole site.
+// v2 drops any signed-in page cached by v1.
+const CACHE_NAME = "checotype-v2";
+const PACK_PATH = /^\/api\/packs\/[a-z]+$/;
+
+self.addEventListener("install", () => {
+  self.skipWaiting();
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    (async () => {
+      for (const name of await caches.keys()) {
+        if (name !== CACHE_NAME) {
+          await caches.delete(name);
+        }
+      }
+      await self.clients.claim();
+    })()
+  );
+});
+
+// Signed-in pages are sent with Cache-Control: no-store and are never kept.
+function storable(response) {
+  return response.ok && !/no-store/.test(response.headers.get("Cache-Control") || "");
+}
+
+async function fetchAndStore(cache, request) {
+  const response = await fetch(request);
+  if (storable(response)) {
+    await cache.put(request, response.clone());
+  }
+  return response;
+}
+
+// Packs answer from the cache at once and refresh in the background; the
+// server redirects to the current content-hashed version.
+async function packResponse(event) {
+  const cache = await caches.open(CACHE_NAME);
+  const cached = await cache.match(event.request);
+  const refresh = fetchAndStore(cache, event.request);
+  if (cached) {
+    event.waitUntil(refresh.catch(() => {}));
+    return cached;
+  }
+  return refresh;
+}
+
+// Fingerprinted assets never change, so a cached copy is always current.
+async function assetResponse(request) {
+  const cache = await caches.open(CACHE_NAME);
+  return (await cache.match(request)) || fetchAndStore(cache, request);
+}
+
+// Pages and unversioned static files prefer the network and fall back to the
+// last anonymous copy seen.
+async function networkFirst(request) {
+  const cache = await caches.open(CACHE_NAME);
+  try {
+    return await fetchAndStore(cache, request);
+  } catch (error) {
+    const cached = await cache.match(request);
+    if (cached) {
+      return cached;
+    }
+    throw error;
+  }
+}
+
+self.addEventListener("fetch", (event) => {
+  const { request } = event;
+  const url = new URL(request.url);
+  if (request.method !== "GET" || url.origin !== self.location.origin) {
+    return;
+  }
+  if (PACK_PATH.test(url.pathname)) {
+    event.respondWith(packResponse(event));
+  } else if (url.pathname.startsWith("/assets/")) {
+    event.respondWith(assetResponse(request));
+  } else if (url.pathname === "/" || url.pathname.startsWith("/static/")) {
+    event.respondWith(networkFirst(request));
+  }
+});
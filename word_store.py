@@ -0,0 +1,494 @@
+"""Compact, memory-mapped word lists.
+
+Each word file is compiled once into a binary file laid out as::
+
+    MAGIC | count (uint32) | tier count (uint32)
+    | tiers (name 8s, start uint32, size uint32, zipf uint32)
+    | offsets (count + 1 native uint32)
+    | per tier: alias probabilities (size float32) + aliases (size uint32)
+    | UTF-8 blob
+
+and then memory-mapped read-only, so every gunicorn worker shares the same
+page-cache pages instead of holding its own list of Python strings. Words are
+decoded on demand when sampled.
+
+Lists with frequency ranks are stored most frequent word first and get
+difficulty tiers: bands of ranks (see DIFFICULTY_TIERS). Within a Zipf tier,
+the word at offset ``r`` is drawn with weight ``1 / (r + size / 10)``, so the
+commonest words of the band come up most; other tiers are uniform. Draws go
+through a precomputed alias table, so each is O(1). Lists without ranks
+(alphabetical lists with no counts file) have no tiers.
+"""
+
+import bisect
+import hashlib
+import itertools
+import math
+import mmap
+import os
+import random
+import struct
+import tempfile
+import threading
+import unicodedata
+from array import array
+from functools import cached_property
+from pathlib import Path
+
+MAGIC = b"CTWORDS3"
+HEADER = struct.Struct("<8sII")
+TIER = struct.Struct("<8sIII")
+# (name, first rank, end rank or None for the rest of the list, Zipf-weighted).
+DIFFICULTY_TIERS = (
+    ("easy", 0, 1000, True),
+    ("medium", 1000, 5000, True),
+    ("hard", 5000, None, False),
+)
+ZIPF_FLATTEN = 10
+UNRANKED = "unranked"
+
+
+def read_word_file(path: Path) -> list[str]:
+    if not path.exists():
+        return []
+    words = [line.strip() for line in path.read_text(encoding="utf-8").splitlines()]
+    return [w for w in words if len(w) > 2]
+
+
+def strip_accents(word: str) -> str:
+    decomposed = unicodedata.normalize("NFD", word)
+    return "".join(ch for ch in decomposed if not 0x300 <= ord(ch) <= 0x36F)
+
+
+PUNCTUATION_WRAPPERS = ("({})", '"{}"')
+PUNCTUATION_SUFFIXES = (",", ".", ";", ":", "!", "?", "...")
+PUNCTUATION_SPECIALS = ("{0}'s", "{0}-{0}", "{0}\u2014{0}")
+
+
+def transform_words(words, caps=False, punctuation=False, numbers=False, rng=random):
+    """Apply the typing-mode transforms to a batch of words.
+
+    Random rolls are drawn once per enabled stage for the whole batch, and
+    only the selected positions are rewritten.
+    """
+    words = list(words)
+    count = len(words)
+    if caps:
+        for i, roll in enumerate([rng.random() for _ in range(count)]):
+            if roll < 0.3 and words[i]:
+                words[i] = words[i][0].upper() + words[i][1:]
+    if numbers:
+        for i, roll in enumerate([rng.random() for _ in range(count)]):
+            if roll <= 0.2:
+                words[i] = "".join(str(rng.randrange(10)) for _ in range(rng.randint(1, 4)))
+    if punctuation:
+        for i, roll in enumerate([rng.random() for _ in range(count)]):
+            if roll > 0.25 or not words[i]:
+                continue
+            style = rng.random()
+            if style < 0.2:
+                words[i] = rng.choice(PUNCTUATION_WRAPPERS).format(words[i])
+            elif style < 0.6:
+                words[i] = words[i] + rng.choice(PUNCTUATION_SUFFIXES)
+            else:
+                words[i] = rng.choice(PUNCTUATION_SPECIALS).format(words[i])
+    return words
+
+
+def read_counts(path: Path) -> dict:
+    """``word count`` lines from a frequency file, keyed by lowercase word."""
+    counts = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[-1].isdigit():
+            word = " ".join(parts[:-1]).lower()
+            counts[word] = counts.get(word, 0) + int(parts[-1])
+    return counts
+
+
+def looks_alphabetical(words, threshold=0.95):
+    pairs = max(len(words) - 1, 1)
+    return sum(a.lower() <= b.lower() for a, b in zip(words, words[1:])) / pairs >= threshold
+
+
+def rank_words(words, counts=None):
+    """Drop duplicates and order words from most to least frequent.
+
+    Returns (words, source). Counts win when given; a list that is not
+    alphabetical is taken to be in frequency order already. An alphabetical
+    list without counts says nothing about frequency, so it keeps its order
+    and source is UNRANKED.
+    """
+    seen = set()
+    unique = []
+    for word in words:
+        if word.lower() not in seen:
+            seen.add(word.lower())
+            unique.append(word)
+    if counts:
+        # sorted() is stable, so words without a count keep their list order at the end.
+        return sorted(unique, key=lambda word: -counts.get(word.lower(), 0)), "counts"
+    if not looks_alphabetical(unique):
+        return unique, "list order"
+    return unique, UNRANKED
+
+
+def tier_ranges(count):
+    """[(name, start, size, zipf)] for the non-empty tiers of a ranked list of count words."""
+    tiers = []
+    for name, start, end, zipf in DIFFICULTY_TIERS:
+        end = count if end is None else min(end, count)
+        if end > start:
+            tiers.append((name, start, end - start, zipf))
+    return tiers
+
+
+def tier_weights(size, zipf):
+    return zipf_weights(size) if zipf else [1.0] * size
+
+
+def zipf_weights(size):
+    flatten = max(1.0, size / ZIPF_FLATTEN)
+    return [1.0 / (rank + flatten) for rank in range(size)]
+
+
+def alias_table(weights):
+    """Vose's alias method: (probabilities, aliases) for O(1) weighted draws."""
+    size = len(weights)
+    total = sum(weights)
+    scaled = [weight * size / total for weight in weights]
+    probabilities = array("f", [1.0] * size)
+    aliases = array("I", range(size))
+    small = [index for index, value in enumerate(scaled) if value < 1.0]
+    large = [index for index, value in enumerate(scaled) if value >= 1.0]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        probabilities[less] = scaled[less]
+        aliases[less] = more
+        scaled[more] -= 1.0 - scaled[less]
+        (small if scaled[more] < 1.0 else large).append(more)
+    return probabilities, aliases
+
+
+def encode_words(words, ranked=False) -> bytes:
+    """Encode words; a ranked list (most frequent first) also gets its tier alias tables."""
+    offsets = array("I", [0])
+    blob = bytearray()
+    for word in words:
+        blob += word.encode("utf-8")
+        offsets.append(len(blob))
+    tiers = tier_ranges(len(words)) if ranked else []
+    out = bytearray(HEADER.pack(MAGIC, len(words), len(tiers)))
+    for name, start, size, zipf in tiers:
+        out += TIER.pack(name.encode("ascii"), start, size, zipf)
+    out += offsets.tobytes()
+    for _, _, size, zipf in tiers:
+        probabilities, aliases = alias_table(tier_weights(size, zipf))
+        out += probabilities.tobytes() + aliases.tobytes()
+    return bytes(out + blob)
+
+
+def compile_words(words, target: Path, ranked=False):
+    """Write words to target in the compact format, atomically."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=target.parent, prefix=target.name, suffix=".tmp")
+    with os.fdopen(fd, "wb") as handle:
+        handle.write(encode_words(words, ranked))
+    os.chmod(tmp_name, 0o644)
+    os.replace(tmp_name, target)
+
+
+class WordStore:
+    def __init__(self, buffer):
+        magic, count, tier_count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a compiled word store")
+        self._buffer = buffer
+        view = memoryview(buffer)
+        tiers = [TIER.unpack_from(buffer, HEADER.size + i * TIER.size) for i in range(tier_count)]
+        start = HEADER.size + tier_count * TIER.size
+        position = start + (count + 1) * 4
+        self._offsets = view[start:position].cast("I")
+        self._tiers = {}
+        for name, first, size, zipf in tiers:
+            probabilities = view[position : position + size * 4].cast("f")
+            aliases = view[position + size * 4 : position + size * 8].cast("I")
+            name = name.rstrip(b"\0").decode("ascii")
+            self._tiers[name] = (first, size, bool(zipf), probabilities, aliases)
+            position += size * 8
+        self._blob = view[position:]
+        self._count = count
+
+    @classmethod
+    def open(cls, path: Path):
+        with open(path, "rb") as handle:
+            if os.fstat(handle.fileno()).st_size == 0:
+                raise ValueError("Empty word store")
+            return cls(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def from_words(cls, words, ranked=False):
+        """In-memory store, used when the cache directory is not writable."""
+        return cls(encode_words(words, ranked))
+
+    def __len__(self):
+        return self._count
+
+    @cached_property
+    def digest(self):
+        """Content hash, so cache keys change whenever the word list does."""
+        return hashlib.sha256(self._buffer).hexdigest()[:16]
+
+    @cached_property
+    def ngram_index(self):
+        """Built on first use; concurrent first calls may both build, and one result is kept."""
+        return NgramIndex(self)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        return bytes(self._blob[self._offsets[index] : self._offsets[index + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    @property
+    def tiers(self):
+        """{difficulty: (first rank, number of words, zipf)}; empty for unranked lists."""
+        return {name: (first, size, zipf) for name, (first, size, zipf, _, _) in self._tiers.items()}
+
+    def sample_tier(self, count, difficulty, rng=random):
+        """Draw count words from a difficulty tier through its alias table, O(1) each.
+
+        Draws are independent, except that a word is never repeated back to back.
+        """
+        first, size, _, probabilities, aliases = self._tiers[difficulty]
+        words = []
+        previous = None
+        while len(words) < count:
+            index = int(rng.random() * size)
+            if rng.random() >= probabilities[index]:
+                index = aliases[index]
+            if index == previous and size > 1:
+                continue
+            previous = index
+            words.append(self[first + index])
+        return words
+
+    def sample(self, count, rng=random, difficulty=None):
+        """Pick count words by random index, without replacement when possible.
+
+        With a difficulty this list has a tier for, draw from that tier instead
+        (see sample_tier); lists without tiers ignore difficulty.
+        """
+        if not self._count or count <= 0:
+            return []
+        if difficulty in self._tiers:
+            return self.sample_tier(count, difficulty, rng)
+        if count <= self._count:
+            indexes = rng.sample(range(self._count), count)
+        else:
+            indexes = [rng.randrange(self._count) for _ in range(count)]
+        return [self[index] for index in indexes]
+
+    def iter_sample(self, count, rng=random, chunk_size=512, difficulty=None):
+        """Yield sampled words in chunks, holding at most one chunk of strings.
+
+        Without-replacement sampling keeps an index list bounded by the store
+        size; larger requests draw each chunk independently.
+        """
+        if not self._count or count <= 0:
+            return
+        if difficulty in self._tiers:
+            for start in range(0, count, chunk_size):
+                yield self.sample_tier(min(chunk_size, count - start), difficulty, rng)
+            return
+        if count <= self._count:
+            indexes = rng.sample(range(self._count), count)
+            for start in range(0, count, chunk_size):
+                yield [self[index] for index in indexes[start : start + chunk_size]]
+            return
+        remaining = count
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            yield [self[rng.randrange(self._count)] for _ in range(size)]
+            remaining -= size
+
+
+def corpus_stats(words, rank_source, duplicates):
+    """Summary of a compiled list: sizes, how ranks were assigned and per-tier figures."""
+    tiers = {}
+    for name, start, size, zipf in tier_ranges(len(words)) if rank_source != UNRANKED else []:
+        weights = tier_weights(size, zipf)
+        total = sum(weights)
+        tier_words = words[start : start + size]
+        entropy = -sum(weight / total * math.log(weight / total) for weight in weights)
+        tiers[name] = {
+            "ranks": f"{start + 1}-{start + size}",
+            "words": size,
+            # Expected length of a drawn word, so tiers can be compared with uniform sampling.
+            "mean_length": round(sum(w * len(word) for w, word in zip(weights, tier_words)) / total, 2),
+            # exp(entropy): how many equally likely words the draw is worth.
+            "effective_words": round(math.exp(entropy)),
+            "top_share": round(max(weights) / total, 4),
+        }
+    return {
+        "words": len(words),
+        "duplicates_removed": duplicates,
+        "rank_source": rank_source,
+        "mean_length": round(sum(map(len, words)) / len(words), 2) if words else 0,
+        "top": words[:10] if rank_source != UNRANKED else [],
+        "tiers": tiers,
+    }
+
+
+class NgramIndex:
+    """Inverted index from lowercase characters and bigrams to word ids.
+
+    Postings for every unit live in one flat ``array("I")``; ``spans`` maps a
+    unit to its slice, so finding the words that contain a unit is a single
+    dict lookup rather than a scan of the list.
+    """
+
+    def __init__(self, store):
+        postings = {}
+        for word_id, word in enumerate(store):
+            lowered = word.lower()
+            units = set(lowered)
+            units.update(lowered[i : i + 2] for i in range(len(lowered) - 1))
+            for unit in units:
+                postings.setdefault(unit, []).append(word_id)
+        self.ids = array("I")
+        self.spans = {}
+        for unit, word_ids in postings.items():
+            start = len(self.ids)
+            self.ids.extend(word_ids)
+            self.spans[unit] = (start, len(self.ids))
+
+    def __contains__(self, unit):
+        return unit in self.spans
+
+    def sample(self, weights, count, rng=random):
+        """Draw count word ids: a unit by weight, then a word containing it uniformly.
+
+        Cost per draw is O(log units), independent of the size of the list.
+        """
+        units = [(self.spans[unit], weight) for unit, weight in weights if unit in self.spans and weight > 0]
+        if not units or count <= 0:
+            return []
+        cumulative = list(itertools.accumulate(weight for _, weight in units))
+        ids = []
+        for _ in range(count):
+            start, end = units[bisect.bisect(cumulative, rng.random() * cumulative[-1])][0]
+            ids.append(self.ids[start + rng.randrange(end - start)])
+        return ids
+
+
+class WordStoreRegistry:
+    """Lazily compiles and maps one WordStore per language on first use.
+
+    Each language also has an accent-stripped ("plain") variant compiled from
+    the same list, so index i refers to the same word in both stores.
+    """
+
+    def __init__(self, sources: dict, cache_dir: Path, default="en", logger=None):
+        self.sources = sources
+        self.cache_dir = Path(cache_dir)
+        self.default = default
+        self.logger = logger
+        self._stores = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _compiled_path(self, lang, source: Path, plain=False):
+        suffix = "-plain" if plain else ""
+        return self.cache_dir / f"{lang}-{source.stem}{suffix}.words"
+
+    @staticmethod
+    def counts_path(source: Path):
+        """Optional ``word count`` frequency file next to a list, e.g. words.counts.txt."""
+        return source.with_name(f"{source.stem}.counts.txt")
+
+    def _ranked_source(self, source):
+        counts_path = self.counts_path(source)
+        counts = read_counts(counts_path) if counts_path.exists() else None
+        return rank_words(read_word_file(source), counts)
+
+    def _read_source(self, source, plain):
+        """(words, ranked); ranked before stripping accents so both variants share word ids."""
+        words, rank_source = self._ranked_source(source)
+        return [strip_accents(w) for w in words] if plain else words, rank_source != UNRANKED
+
+    def _stale(self, target, source):
+        if not target.exists():
+            return True
+        built = target.stat().st_mtime_ns
+        counts_path = self.counts_path(source)
+        if counts_path.exists() and built < counts_path.stat().st_mtime_ns:
+            return True
+        if built < source.stat().st_mtime_ns:
+            return True
+        with open(target, "rb") as handle:
+            return handle.read(len(MAGIC)) != MAGIC
+
+    def _load(self, lang, plain):
+        source = self.sources.get(lang)
+        if source is None or not source.exists():
+            return None
+        target = self._compiled_path(lang, source, plain)
+        try:
+            if self._stale(target, source):
+                words, ranked = self._read_source(source, plain)
+                compile_words(words, target, ranked)
+            store = WordStore.open(target)
+        except (OSError, ValueError):
+            if self.logger:
+                self.logger.warning("Word store cache unavailable for %s; loading in memory.", lang)
+            store = WordStore.from_words(*self._read_source(source, plain))
+        return store if len(store) else None
+
+    def get(self, lang, plain=False):
+        """Return the store for lang, falling back to the default language."""
+        if lang not in self.sources:
+            lang = self.default
+        key = (lang, plain)
+        if key in self._stores:
+            self.hits += 1
+        else:
+            with self._lock:
+                if key in self._stores:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    store = self._load(lang, plain)
+                    if store is None and self.logger and not plain:
+                        self.logger.warning(
+                            "No words available for %s; falling back to %s.", lang, self.default
+                        )
+                    self._stores[key] = store
+        store = self._stores[key]
+        if store is None and lang != self.default:
+            return self.get(self.default, plain)
+        return store
+
+    def compile_all(self):
+        """Compile every available source up front, e.g. during a deploy build.
+
+        Returns {lang: corpus_stats(...)} for the compiled lists.
+        """
+        compiled = {}
+        for lang, source in self.sources.items():
+            if not source.exists():
+                continue
+            words, rank_source = self._ranked_source(source)
+            for plain in (False, True):
+                variant = [strip_accents(w) for w in words] if plain else words
+                compile_words(variant, self._compiled_path(lang, source, plain), rank_source != UNRANKED)
+            raw_count = len(read_word_file(source))
+            compiled[lang] = corpus_stats(words, rank_source, raw_count - len(words))
+        return compiled
+
+    def loaded(self):
+        return sorted({lang for (lang, _), store in self._stores.items() if store is not None})